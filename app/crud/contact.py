@@ -3,121 +3,187 @@ CRUD operations for managing contacts in the database.
 Implements create, read, update, delete, search, and upcoming birthdays logic.
 """
 
+import calendar
 from datetime import date, timedelta
 from typing import List, Optional
 
 from fastapi import HTTPException, status
-from sqlalchemy import or_
+from sqlalchemy import RowMapping, delete, func, lambda_stmt, literal_column, or_, select, update
 from sqlalchemy.orm import Session
 
-from app.models.contact import Contact
+from app.database import upsert_insert
+from app.models.contact import Contact, contact_search_vector, contacts_fts
 from app.schemas.contact import ContactCreate, ContactUpdate
-from app.utils.auth import decode_access_token
 
 
-def _get_user_id(token: str) -> int:
-    """Extract and validate the current user id from a JWT access token.
+# Columns exposed by ``ContactOut``. List endpoints select these directly and
+# return row mappings, skipping ORM instance construction per row.
+_CONTACT_OUT_COLUMNS = (
+    Contact.id,
+    Contact.first_name,
+    Contact.last_name,
+    Contact.email,
+    Contact.phone,
+    Contact.birthday,
+    Contact.extra,
+    Contact.user_id,
+)
+
+
+def _fts_prefix_query(query: str) -> str:
+    """Build an FTS5 MATCH expression requiring every word as a token prefix.
+
+    Each word is quoted, so FTS5 operators and punctuation in user input are
+    treated as literal text.
+    """
+    return " ".join('"' + word.replace('"', '""') + '"*' for word in query.split())
+
+
+def _owned_contact(db: Session, contact_id: int, user_id: int) -> Contact:
+    """Load a contact by primary key and ensure it belongs to ``user_id``.
+
+    ``Session.get`` consults the identity map before issuing a primary-key
+    lookup. A missing contact and one owned by someone else both yield 404.
+    """
+    obj = db.get(Contact, contact_id)
+    if obj is None or obj.user_id != user_id:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Contact not found")
+    return obj
+
+
+def create_contact(db: Session, contact: ContactCreate, user_id: int) -> Contact:
+    """Create a new contact owned by the authenticated user.
 
     Parameters
     ----------
-    token : str
-        Bearer JWT access token provided by the client.
+    db : Session
+        SQLAlchemy database session.
+    contact : ContactCreate
+        Validated contact data to be persisted.
+    user_id : int
+        Id of the authenticated user.
 
     Returns
     -------
-    int
-        The authenticated user's id.
+    Contact
+        The newly created contact ORM instance.
 
     Raises
     ------
     HTTPException
-        If the token is missing or invalid, or if the payload lacks a user_id.
+        If a contact with the same email already exists for the user.
     """
-    payload = decode_access_token(token) if token else None
-    if not payload or not payload.get("user_id"):
+    # Email is unique per system: a single INSERT ... ON CONFLICT both checks and
+    # inserts, so concurrent requests cannot race between the two.
+    stmt = (
+        upsert_insert(db, Contact)
+        .values(**contact.model_dump(exclude={"user_id"}), user_id=user_id)
+        .on_conflict_do_nothing(index_elements=["email"])
+        .returning(Contact)
+    )
+    obj = db.scalars(stmt).first()
+    if obj is None:
         raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid or missing access token",
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Contact with this email already exists",
         )
-    return int(payload["user_id"])  # enforce int
+    db.commit()
+    return obj
 
 
-def create_contact(db: Session, contact: ContactCreate, token: str) -> Contact:
-    """Create a new contact owned by the authenticated user.
+def bulk_create_contacts(db: Session, contacts: List[ContactCreate], user_id: int) -> List[RowMapping]:
+    """Create several contacts for the authenticated user in one statement.
 
     Parameters
     ----------
     db : Session
         SQLAlchemy database session.
-    contact : ContactCreate
+    contacts : List[ContactCreate]
         Validated contact data to be persisted.
-    token : str
-        Bearer JWT access token of the current user.
+    user_id : int
+        Id of the authenticated user.
 
     Returns
     -------
-    Contact
-        The newly created contact ORM instance.
+    List[RowMapping]
+        Column mappings of the created contacts, ordered by id.
 
     Raises
     ------
     HTTPException
-        If a contact with the same email already exists for the user.
+        409 if any email already exists or repeats within the batch; nothing
+        is inserted in that case.
     """
-    user_id = _get_user_id(token)
-    # Ensure unique email per system (or per user depending on requirements)
-    existing = db.query(Contact).filter(Contact.email == contact.email).first()
-    if existing:
+    if not contacts:
+        return []
+    rows = [{**contact.model_dump(exclude={"user_id"}), "user_id": user_id} for contact in contacts]
+    # The rows are sent as one batched INSERT ... RETURNING ("insertmanyvalues")
+    # and committed once; conflicting emails are skipped and detected by count.
+    stmt = (
+        upsert_insert(db, Contact)
+        .on_conflict_do_nothing(index_elements=["email"])
+        .returning(*_CONTACT_OUT_COLUMNS)
+    )
+    created = [row._mapping for row in db.execute(stmt, rows).all()]
+    if len(created) != len(rows):
+        db.rollback()
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT,
             detail="Contact with this email already exists",
         )
-
-    obj = Contact(
-        first_name=contact.first_name,
-        last_name=contact.last_name,
-        email=contact.email,
-        phone=contact.phone,
-        birthday=contact.birthday,
-        extra=contact.extra,
-        user_id=user_id,
-    )
-    db.add(obj)
     db.commit()
-    db.refresh(obj)
-    return obj
+    return sorted(created, key=lambda row: row["id"])
 
 
-def get_contacts(db: Session, skip: int = 0, limit: int = 100, token: str = None) -> List[Contact]:
+def get_contacts(
+    db: Session,
+    user_id: int,
+    skip: int = 0,
+    limit: int = 100,
+    after_id: Optional[int] = None,
+) -> List[RowMapping]:
     """List contacts for the authenticated user with pagination.
 
+    Contacts are ordered by id. Passing ``after_id`` (the last id of the
+    previous page) seeks straight to the next page through the
+    ``(user_id, id)`` index. ``skip`` is the deprecated OFFSET-based
+    alternative, whose cost grows with the page number.
+
     Parameters
     ----------
     db : Session
         SQLAlchemy session.
+    user_id : int
+        Id of the authenticated user.
     skip : int, optional
-        Number of records to skip (offset), by default 0.
+        Number of records to skip (offset), by default 0. Ignored when
+        ``after_id`` is given.
     limit : int, optional
         Maximum number of records to return, by default 100.
-    token : str, optional
-        JWT access token. If omitted, raises 401.
+    after_id : int, optional
+        Keyset cursor: return only contacts with an id greater than this.
 
     Returns
     -------
-    List[Contact]
-        A list of contacts belonging to the current user.
+    List[RowMapping]
+        Column mappings of the contacts belonging to the current user.
     """
-    user_id = _get_user_id(token)
-    return (
-        db.query(Contact)
-        .filter(Contact.user_id == user_id)
-        .offset(skip)
+    # Lambda statements are built and cache-keyed once per code path; later
+    # calls only extract the closure values as bound parameters.
+    stmt = lambda_stmt(
+        lambda: select(*_CONTACT_OUT_COLUMNS)
+        .where(Contact.user_id == user_id)
+        .order_by(Contact.id)
         .limit(limit)
-        .all()
     )
+    if after_id is not None:
+        stmt += lambda s: s.where(Contact.id > after_id)
+    elif skip:
+        stmt += lambda s: s.offset(skip)
+    return [row._mapping for row in db.execute(stmt).all()]
 
 
-def get_contact(db: Session, contact_id: int, token: str = None) -> Optional[Contact]:
+def get_contact(db: Session, contact_id: int, user_id: int) -> Optional[Contact]:
     """Retrieve a single contact by id ensuring ownership.
 
     Parameters
@@ -126,8 +192,8 @@ def get_contact(db: Session, contact_id: int, token: str = None) -> Optional[Con
         SQLAlchemy session.
     contact_id : int
         Primary key of the contact.
-    token : str, optional
-        JWT access token.
+    user_id : int
+        Id of the authenticated user.
 
     Returns
     -------
@@ -139,14 +205,10 @@ def get_contact(db: Session, contact_id: int, token: str = None) -> Optional[Con
     HTTPException
         If the contact does not exist or is not owned by the user.
     """
-    user_id = _get_user_id(token)
-    obj = db.query(Contact).filter(Contact.id == contact_id, Contact.user_id == user_id).first()
-    if not obj:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Contact not found")
-    return obj
+    return _owned_contact(db, contact_id, user_id)
 
 
-def update_contact(db: Session, contact_id: int, contact: ContactUpdate, token: str = None) -> Optional[Contact]:
+def update_contact(db: Session, contact_id: int, contact: ContactUpdate, user_id: int) -> Optional[Contact]:
     """Update an existing contact owned by the current user.
 
     Parameters
@@ -156,9 +218,10 @@ def update_contact(db: Session, contact_id: int, contact: ContactUpdate, token:
     contact_id : int
         Contact id.
     contact : ContactUpdate
-        New values for the contact.
-    token : str, optional
-        JWT access token.
+        New values for the contact; fields omitted from the request are left
+        unchanged.
+    user_id : int
+        Id of the authenticated user.
 
     Returns
     -------
@@ -170,24 +233,22 @@ def update_contact(db: Session, contact_id: int, contact: ContactUpdate, token:
     HTTPException
         If the contact is not found or not owned by the user.
     """
-    user_id = _get_user_id(token)
-    obj = db.query(Contact).filter(Contact.id == contact_id, Contact.user_id == user_id).first()
-    if not obj:
+    # One UPDATE ... RETURNING both checks ownership and applies the change.
+    # Only fields present in the request are written; the owner never changes.
+    stmt = (
+        update(Contact)
+        .where(Contact.id == contact_id, Contact.user_id == user_id)
+        .values(**contact.model_dump(exclude_unset=True, exclude={"user_id"}))
+        .returning(Contact)
+    )
+    obj = db.scalars(stmt).one_or_none()
+    if obj is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Contact not found")
-
-    # Apply updates
-    obj.first_name = contact.first_name
-    obj.last_name = contact.last_name
-    obj.email = contact.email
-    obj.phone = contact.phone
-    obj.birthday = contact.birthday
-    obj.extra = contact.extra
     db.commit()
-    db.refresh(obj)
     return obj
 
 
-def delete_contact(db: Session, contact_id: int, token: str = None) -> bool:
+def delete_contact(db: Session, contact_id: int, user_id: int) -> bool:
     """Delete a contact owned by the current user.
 
     Parameters
@@ -196,8 +257,8 @@ def delete_contact(db: Session, contact_id: int, token: str = None) -> bool:
         SQLAlchemy session.
     contact_id : int
         Contact id to delete.
-    token : str, optional
-        JWT access token.
+    user_id : int
+        Id of the authenticated user.
 
     Returns
     -------
@@ -209,16 +270,18 @@ def delete_contact(db: Session, contact_id: int, token: str = None) -> bool:
     HTTPException
         If the contact does not exist or is not owned by the user.
     """
-    user_id = _get_user_id(token)
-    obj = db.query(Contact).filter(Contact.id == contact_id, Contact.user_id == user_id).first()
-    if not obj:
+    stmt = (
+        delete(Contact)
+        .where(Contact.id == contact_id, Contact.user_id == user_id)
+        .returning(Contact.id)
+    )
+    if db.execute(stmt).scalar_one_or_none() is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Contact not found")
-    db.delete(obj)
     db.commit()
     return True
 
 
-def search_contacts(db: Session, query: str, token: str = None) -> List[Contact]:
+def search_contacts(db: Session, query: str, user_id: int, skip: int = 0, limit: int = 100) -> List[RowMapping]:
     """Search contacts by first name, last name, email, or phone for the current user.
 
     Parameters
@@ -226,62 +289,95 @@ def search_contacts(db: Session, query: str, token: str = None) -> List[Contact]
     db : Session
         SQLAlchemy session.
     query : str
-        Case-insensitive search term.
-    token : str, optional
-        JWT access token.
+        Case-insensitive search term. It is matched through the database's
+        full-text index: whole words via the search vector on PostgreSQL,
+        word prefixes via the FTS5 table on SQLite. Only when the term has no
+        such match at all is it matched as a substring of any field. Terms
+        shorter than three characters match as a prefix of the
+        lower-cased value instead of a substring, which the ``lower()``
+        pattern indexes can serve where trigram indexes cannot.
+    user_id : int
+        Id of the authenticated user.
+    skip : int, optional
+        Number of matches to skip (default 0).
+    limit : int, optional
+        Maximum number of matches to return (default 100).
 
     Returns
     -------
-    List[Contact]
-        Matching contacts owned by the user.
+    List[RowMapping]
+        Column mappings of the matching contacts owned by the user.
     """
-    user_id = _get_user_id(token)
-    q = f"%{query}%"
-    return (
-        db.query(Contact)
-        .filter(
-            Contact.user_id == user_id,
-            or_(
-                Contact.first_name.ilike(q),
-                Contact.last_name.ilike(q),
-                Contact.email.ilike(q),
-                Contact.phone.ilike(q),
-            ),
+    def page(condition) -> List[RowMapping]:
+        stmt = (
+            select(*_CONTACT_OUT_COLUMNS)
+            .where(Contact.user_id == user_id, condition)
+            .order_by(Contact.id)
+            .offset(skip)
+            .limit(limit)
         )
-        .all()
-    )
+        return [row._mapping for row in db.execute(stmt).all()]
+
+    columns = (Contact.first_name, Contact.last_name, Contact.email, Contact.phone)
+    if len(query) >= 3:
+        q = f"%{query}%"
+        substring = or_(*(column.ilike(q) for column in columns))
+    else:
+        q = f"{query.lower()}%"
+        substring = or_(*(func.lower(column).like(q) for column in columns))
+
+    full_text = None
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        full_text = contact_search_vector.op("@@")(func.websearch_to_tsquery("simple", query))
+    elif dialect == "sqlite" and query.strip():
+        fts_ids = select(contacts_fts.c.rowid).where(
+            literal_column("contacts_fts").op("MATCH")(_fts_prefix_query(query))
+        )
+        full_text = Contact.id.in_(fts_ids)
+
+    if full_text is not None:
+        matches = page(full_text)
+        if matches:
+            return matches
+        # Past the last full-text match is still the full-text path: the
+        # fallback is only taken when the search has no full-text match at all,
+        # so every page of one search comes from the same query
+        if skip and db.execute(select(Contact.id).where(Contact.user_id == user_id, full_text).limit(1)).first():
+            return []
+    return page(substring)
 
 
-def get_upcoming_birthdays(db: Session, token: str = None) -> List[Contact]:
+def get_upcoming_birthdays(db: Session, user_id: int) -> List[RowMapping]:
     """Get contacts whose birthdays fall within the next 7 days.
 
     Parameters
     ----------
     db : Session
         SQLAlchemy session.
-    token : str, optional
-        JWT access token.
+    user_id : int
+        Id of the authenticated user.
 
     Returns
     -------
-    List[Contact]
-        Contacts with birthdays in the upcoming week.
+    List[RowMapping]
+        Column mappings of the contacts with birthdays in the upcoming week.
     """
-    user_id = _get_user_id(token)
     today = date.today()
     next_week = today + timedelta(days=7)
 
-    # Compare month/day portion. For simplicity with SQLite, filter by range in year
-    # and refine in Python if necessary.
-    results = db.query(Contact).filter(Contact.user_id == user_id).all()
-
-    def _is_upcoming(bday: date) -> bool:
-        # Normalize year to current for comparison by month/day
-        try:
-            normalized = date(today.year, bday.month, bday.day)
-        except ValueError:
-            # Handle Feb 29 in non-leap years: treat as Mar 1
-            normalized = date(today.year, 3, 1)
-        return today <= normalized <= next_week
-
-    return [c for c in results if _is_upcoming(c.birthday)]
+    # Compare the year-independent MMDD key in SQL so only matching rows are
+    # returned. A window crossing New Year is split into two ranges.
+    start = today.month * 100 + today.day
+    end = next_week.month * 100 + next_week.day
+    mmdd = Contact.birthday_mmdd
+    if start <= end:
+        window = mmdd.between(start, end)
+    else:
+        window = or_(mmdd >= start, mmdd <= end)
+    # Feb 29 birthdays are celebrated on Mar 1 in non-leap years
+    if not calendar.isleap(today.year) and today <= date(today.year, 3, 1) <= next_week:
+        window = or_(window, mmdd == 229)
+
+    stmt = select(*_CONTACT_OUT_COLUMNS).where(Contact.user_id == user_id, window)
+    return [row._mapping for row in db.execute(stmt).all()]
@@ -1,11 +1,13 @@
 """
 CRUD operations for user registration, authentication, email verification, and avatar update.
 """
+from sqlalchemy import or_, select
 from sqlalchemy.orm import Session
 from fastapi import HTTPException, status
+from app.database import upsert_insert
 from app.models.user import User
 from app.schemas.user import UserCreate
-from app.utils.auth import get_password_hash, verify_password
+from app.utils.auth import get_password_hash, password_needs_rehash, verify_dummy_password, verify_password
 
 
 def create_user(db: Session, user: UserCreate):
@@ -28,18 +30,26 @@ def create_user(db: Session, user: UserCreate):
     HTTPException
         409 if the email or username already exists.
     """
-    if db.query(User).filter(User.email == user.email).first():
-        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Email already registered")
-    if db.query(User).filter(User.username == user.username).first():
-        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Username already taken")
-    db_user = User(
-        username=user.username,
-        email=user.email,
-        hashed_password=get_password_hash(user.password)
+    # ON CONFLICT covers both unique columns; only on conflict do we look up which one fired.
+    stmt = (
+        upsert_insert(db, User)
+        .values(
+            username=user.username,
+            email=user.email,
+            hashed_password=get_password_hash(user.password),
+        )
+        .on_conflict_do_nothing()
+        .returning(User)
     )
-    db.add(db_user)
+    db_user = db.scalars(stmt).first()
+    if db_user is None:
+        existing = db.execute(
+            select(User.email).where(or_(User.email == user.email, User.username == user.username))
+        ).scalars().all()
+        if user.email in existing:
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Email already registered")
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Username already taken")
     db.commit()
-    db.refresh(db_user)
     return db_user
 
 
@@ -66,8 +76,17 @@ def authenticate_user(db: Session, username: str, password: str):
         401 for invalid credentials.
     """
     user = db.query(User).filter(User.username == username).first()
-    if not user or not verify_password(password, user.hashed_password):
+    # End the read transaction so no connection is held while verifying
+    db.commit()
+    if not user:
+        verify_dummy_password(password)
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
+    if not verify_password(password, user.hashed_password):
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
+    # Transparently upgrade legacy bcrypt hashes now that the plaintext is known
+    if password_needs_rehash(user.hashed_password):
+        user.hashed_password = get_password_hash(password)
+        db.commit()
     return user
 
 
@@ -96,7 +115,6 @@ def verify_user_email(db: Session, user_id: int):
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
     user.is_verified = True
     db.commit()
-    db.refresh(user)
     return user
 
 
@@ -127,5 +145,4 @@ def update_avatar(db: Session, user_id: int, avatar_url: str):
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
     user.avatar_url = avatar_url
     db.commit()
-    db.refresh(user)
     return user
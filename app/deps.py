@@ -0,0 +1,144 @@
+"""
+Shared FastAPI dependencies for authenticated routes.
+Resolves the current user id from the bearer access token once per request,
+and the current user's profile from the Redis cache.
+"""
+from fastapi import Depends, HTTPException, status
+from fastapi.security import OAuth2PasswordBearer
+from sqlalchemy.orm import Session
+
+from app.database import SessionLocal
+from app.models.user import User
+from app.schemas.user import UserOut
+from app.utils.auth import access_token_user_id
+from app.utils.cache import cache_user, get_cached_user
+
+oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/users/login")
+
+
+def get_current_user_id(token: str = Depends(oauth2_scheme)) -> int:
+    """Extract and validate the current user id from a JWT access token.
+
+    FastAPI caches dependency results within a request, so every route or
+    sub-dependency asking for the user id shares a single lookup, and
+    ``access_token_user_id`` caches resolved ids across requests.
+
+    Parameters
+    ----------
+    token : str
+        Bearer JWT access token provided by the client.
+
+    Returns
+    -------
+    int
+        The authenticated user's id.
+
+    Raises
+    ------
+    HTTPException
+        If the token is missing or invalid, or if the payload lacks a user_id.
+    """
+    user_id = access_token_user_id(token) if token else None
+    if user_id is not None:
+        return user_id
+    raise HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Invalid or missing access token",
+    )
+
+
+def get_db():
+    """Provide a SQLAlchemy session for request lifecycle.
+
+    Yields:
+        Session: Database session that is closed after request is handled.
+    """
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+# Cached profiles must carry every field of the public user schema
+_USER_FIELDS = frozenset(UserOut.model_fields)
+
+
+def user_cache_payload(user: User) -> dict:
+    """Serialize a user into the form stored in the Redis cache.
+
+    Parameters
+    ----------
+    user : User
+        ORM user instance.
+
+    Returns
+    -------
+    dict
+        Every ``UserOut`` field of the user.
+    """
+    return UserOut.model_validate(user).model_dump()
+
+
+def get_current_user(
+    user_id: int = Depends(get_current_user_id),
+    db: Session = Depends(get_db),
+) -> dict:
+    """Return the authenticated user's profile, preferring the Redis cache.
+
+    On a cache miss (or an entry missing fields) the user is loaded from the
+    database once and the cache is primed for later requests.
+
+    Parameters
+    ----------
+    user_id : int
+        Id resolved from the access token.
+    db : Session
+        Database session, only used on a cache miss.
+
+    Returns
+    -------
+    dict
+        The user's ``UserOut`` fields.
+
+    Raises
+    ------
+    HTTPException
+        404 if the token's user no longer exists.
+    """
+    cached = get_cached_user(user_id)
+    if cached and cached.keys() >= _USER_FIELDS:
+        return cached
+    user = db.get(User, user_id)
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    data = user_cache_payload(user)
+    cache_user(user.id, data)
+    return data
+
+
+def require_admin(db: Session, user: dict, detail: str) -> None:
+    """Raise 403 unless the user is an admin.
+
+    The cached role is trusted when it says admin; otherwise the database is
+    consulted in case the user was promoted after their entry was cached.
+
+    Parameters
+    ----------
+    db : Session
+        Database session, only used when the cached role is not admin.
+    user : dict
+        Profile returned by ``get_current_user``.
+    detail : str
+        Error message for the 403 response.
+
+    Raises
+    ------
+    HTTPException
+        403 if the user is not an admin.
+    """
+    if user.get("role") == "admin":
+        return
+    role = db.query(User.role).filter(User.id == user["id"]).scalar()
+    if role != "admin":
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=detail)
@@ -2,34 +2,48 @@
 Main entry point for the FastAPI Contacts REST API application.
 Initializes the database tables and includes the contacts router.
 """
+import asyncio
 import os
-import time
 from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from sqlalchemy.exc import OperationalError
 from app.database import Base, engine
+from app.models.contact import upgrade_contact_schema
 from app.routers import contact, user
+from app.utils.auth import close_smtp
 
 # During local testing (pytest) create tables automatically to simplify setup.
 if not os.environ.get("READTHEDOCS") and not os.environ.get("SPHINX_BUILD"):
     if engine is not None and os.environ.get('TESTING') == '1':
         Base.metadata.create_all(bind=engine)
 
+_CREATE_TABLES_ATTEMPTS = 6
+
+
 @asynccontextmanager
 async def lifespan(_app: FastAPI):
-    # Skip when building docs or when running tests (tests handle their own setup)
+    # Skip when building docs or when running tests (tests handle their own setup).
+    # Set AUTO_CREATE_TABLES=0 when the schema is managed outside the app.
     if not (os.environ.get("READTHEDOCS") or os.environ.get("SPHINX_BUILD")):
-        if os.environ.get('TESTING') != '1' and engine is not None:
-            # Retry a few times in case DB is not immediately reachable
-            for _ in range(10):
+        if (
+            os.environ.get('TESTING') != '1'
+            and os.environ.get('AUTO_CREATE_TABLES', '1') == '1'
+            and engine is not None
+        ):
+            # Retry with exponential backoff (1, 2, 4, 8, 10 s) in case the DB
+            # is not immediately reachable
+            for attempt in range(_CREATE_TABLES_ATTEMPTS):
                 try:
                     Base.metadata.create_all(bind=engine)
+                    upgrade_contact_schema(engine)
                     break
                 except OperationalError:
-                    time.sleep(2)
+                    if attempt < _CREATE_TABLES_ATTEMPTS - 1:
+                        await asyncio.sleep(min(2 ** attempt, 10))
     yield
+    close_smtp()
 
 app = FastAPI(
     title="Contacts REST API",
@@ -46,6 +60,8 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Let browser clients read the keyset pagination cursor of GET /contacts/
+    expose_headers=["X-Next-Cursor"],
 )
 
 # Serve Sphinx HTML docs (built into docs/_build). Avoid mounting at root during tests,
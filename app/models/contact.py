@@ -2,11 +2,20 @@
 SQLAlchemy models for the Contacts REST API.
 Defines the Contact model representing a contact entity in the database.
 """
+import logging
 
-from sqlalchemy import Column, Date, ForeignKey, Integer, String
+from sqlalchemy import (
+    DDL, Column, Date, ForeignKey, Index, Integer, String, column, event, extract, func, literal_column, table,
+)
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.hybrid import hybrid_property
+from sqlalchemy.schema import CreateIndex
 
 from app.database import Base
 
+logger = logging.getLogger(__name__)
+
 
 class Contact(Base):
     """SQLAlchemy model for storing contact information.
@@ -32,8 +41,12 @@ class Contact(Base):
     """
 
     __tablename__ = 'contacts'
+    # Every contact query is scoped by owner, so lead the composite index with user_id.
+    __table_args__ = (
+        Index("ix_contacts_user_id_id", "user_id", "id"),
+    )
 
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True)
     first_name = Column(String, nullable=False)
     last_name = Column(String, nullable=False)
     email = Column(String, unique=True, index=True, nullable=False)
@@ -41,3 +54,152 @@ class Contact(Base):
     birthday = Column(Date, nullable=False)
     extra = Column(String, nullable=True)
     user_id = Column(Integer, ForeignKey('users.id'), nullable=False)
+
+    @hybrid_property
+    def birthday_mmdd(self) -> int:
+        """Birthday as a ``MMDD`` integer, independent of the birth year."""
+        return self.birthday.month * 100 + self.birthday.day
+
+    @birthday_mmdd.inplace.expression
+    @classmethod
+    def _birthday_mmdd_expression(cls):
+        # Literal multiplier so the query expression matches the index expression verbatim.
+        return extract("month", cls.birthday) * literal_column("100") + extract("day", cls.birthday)
+
+
+# Backs the upcoming-birthdays range scan for a single owner.
+Index("ix_contacts_user_birthday_mmdd", Contact.user_id, Contact.birthday_mmdd)
+
+# Trigram GIN indexes let PostgreSQL serve the ILIKE '%term%' predicates of
+# contact search from an index instead of a sequential scan.
+_TRGM_COLUMNS = ("first_name", "last_name", "email", "phone")
+for _column in _TRGM_COLUMNS:
+    Index(
+        f"ix_contacts_{_column}_trgm",
+        Contact.__table__.c[_column],
+        postgresql_using="gin",
+        postgresql_ops={_column: "gin_trgm_ops"},
+    ).ddl_if(dialect="postgresql")
+
+# Short search terms are matched as a prefix of lower(column); text_pattern_ops
+# lets PostgreSQL serve those LIKE 'term%' predicates from a btree index.
+for _column in _TRGM_COLUMNS:
+    _lowered = func.lower(Contact.__table__.c[_column]).label(f"lower_{_column}")
+    Index(
+        f"ix_contacts_{_column}_lower",
+        _lowered,
+        postgresql_ops={_lowered.name: "text_pattern_ops"},
+    ).ddl_if(dialect="postgresql")
+
+_PG_TRGM_DDL = "CREATE EXTENSION IF NOT EXISTS pg_trgm"
+event.listen(Contact.__table__, "before_create", DDL(_PG_TRGM_DDL).execute_if(dialect="postgresql"))
+
+# Full-text search vector over all searchable fields, maintained by PostgreSQL
+# as a stored generated column behind a single GIN index. It is created via DDL
+# rather than mapped so the SQLite schema used in tests stays unchanged.
+_SEARCH_VECTOR_SQL = (
+    "to_tsvector('simple', coalesce(first_name, '') || ' ' || coalesce(last_name, '')"
+    " || ' ' || coalesce(email, '') || ' ' || coalesce(phone, ''))"
+)
+_SEARCH_VECTOR_DDL = (
+    "ALTER TABLE contacts ADD COLUMN IF NOT EXISTS search_vector tsvector"
+    f" GENERATED ALWAYS AS ({_SEARCH_VECTOR_SQL}) STORED",
+    "CREATE INDEX IF NOT EXISTS ix_contacts_search_vector ON contacts USING gin (search_vector)",
+)
+for _ddl in _SEARCH_VECTOR_DDL:
+    event.listen(Contact.__table__, "after_create", DDL(_ddl).execute_if(dialect="postgresql"))
+
+
+contact_search_vector = literal_column("contacts.search_vector")
+"""SQL expression for the PostgreSQL-only ``contacts.search_vector`` column."""
+
+# SQLite counterpart: an external-content FTS5 index over the same fields,
+# kept in sync with ``contacts`` by triggers. The virtual table is not dropped
+# with ``contacts``, so it is removed explicitly before the table goes.
+_FTS_COLUMNS = "first_name, last_name, email, phone"
+_FTS_NEW = "new.id, new.first_name, new.last_name, new.email, new.phone"
+_FTS_OLD = "'delete', old.id, old.first_name, old.last_name, old.email, old.phone"
+for _ddl in (
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS contacts_fts USING fts5({_FTS_COLUMNS}, content='contacts', content_rowid='id')",
+    f"CREATE TRIGGER contacts_fts_ai AFTER INSERT ON contacts BEGIN "
+    f"INSERT INTO contacts_fts(rowid, {_FTS_COLUMNS}) VALUES ({_FTS_NEW}); END",
+    f"CREATE TRIGGER contacts_fts_ad AFTER DELETE ON contacts BEGIN "
+    f"INSERT INTO contacts_fts(contacts_fts, rowid, {_FTS_COLUMNS}) VALUES ({_FTS_OLD}); END",
+    f"CREATE TRIGGER contacts_fts_au AFTER UPDATE ON contacts BEGIN "
+    f"INSERT INTO contacts_fts(contacts_fts, rowid, {_FTS_COLUMNS}) VALUES ({_FTS_OLD}); "
+    f"INSERT INTO contacts_fts(rowid, {_FTS_COLUMNS}) VALUES ({_FTS_NEW}); END",
+):
+    event.listen(Contact.__table__, "after_create", DDL(_ddl).execute_if(dialect="sqlite"))
+event.listen(
+    Contact.__table__,
+    "before_drop",
+    DDL("DROP TABLE IF EXISTS contacts_fts").execute_if(dialect="sqlite"),
+)
+
+contacts_fts = table("contacts_fts", column("rowid"))
+"""Lightweight table construct for the SQLite-only ``contacts_fts`` index."""
+
+
+# Indexes older schemas created that no query uses any more: ix_contacts_id
+# duplicates the primary key, and no query filters on (user_id, email); email
+# conflicts go through the unique ix_contacts_email.
+_OBSOLETE_INDEXES = frozenset({"ix_contacts_id", "ix_contacts_user_email"})
+
+
+def _pending_contact_ddl(connection: Connection) -> list:
+    """Return the DDL elements an existing PostgreSQL ``contacts`` table still lacks."""
+    has_trgm = connection.exec_driver_sql(
+        "SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'"
+    ).first() is not None
+    has_search_vector = connection.exec_driver_sql(
+        "SELECT 1 FROM information_schema.columns WHERE table_schema = current_schema()"
+        " AND table_name = 'contacts' AND column_name = 'search_vector'"
+    ).first() is not None
+    indexes = {name for (name,) in connection.exec_driver_sql(
+        "SELECT indexname FROM pg_indexes WHERE schemaname = current_schema() AND tablename = 'contacts'"
+    )}
+
+    pending = []
+    if not has_trgm:
+        pending.append(DDL(_PG_TRGM_DDL))
+    if not has_search_vector:
+        pending.append(DDL(_SEARCH_VECTOR_DDL[0]))
+    if "ix_contacts_search_vector" not in indexes:
+        pending.append(DDL(_SEARCH_VECTOR_DDL[1]))
+    for index in sorted(Contact.__table__.indexes, key=lambda i: i.name):
+        if index.name not in indexes:
+            pending.append(CreateIndex(index, if_not_exists=True))
+    for name in sorted(_OBSOLETE_INDEXES & indexes):
+        pending.append(DDL(f"DROP INDEX IF EXISTS {name}"))
+    return pending
+
+
+def upgrade_contact_schema(engine: Engine) -> None:
+    """Bring an existing PostgreSQL ``contacts`` table up to the current schema.
+
+    ``create_all`` skips tables that already exist, so the search vector
+    column, the extension and indexes added since the table was first created
+    are applied here. The catalog is checked first and only missing objects
+    are created, each in its own short transaction, so a boot against an
+    up-to-date schema takes no locks. A failing step (e.g. no permission to
+    create ``pg_trgm``) is logged and skipped rather than stopping startup.
+    On other dialects this does nothing.
+
+    Parameters
+    ----------
+    engine : Engine
+        Engine of the application database.
+    """
+    if engine.dialect.name != "postgresql":
+        return
+    with engine.connect() as connection:
+        pending = _pending_contact_ddl(connection)
+    for ddl in pending:
+        statement = str(ddl.compile(dialect=engine.dialect))
+        try:
+            with engine.begin() as connection:
+                connection.execute(ddl)
+        except SQLAlchemyError:
+            logger.exception("Contact schema upgrade step failed: %s", statement)
+        else:
+            logger.info("Contact schema upgraded: %s", statement)
@@ -19,7 +19,7 @@ class User(Base):
     email : str
         Unique email address.
     hashed_password : str
-        Bcrypt-hashed password.
+        Argon2id password hash (legacy bcrypt hashes are upgraded on login).
     is_active : bool
         Whether the user is active.
     is_verified : bool
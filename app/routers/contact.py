@@ -2,74 +2,117 @@
 FastAPI router for managing contact endpoints.
 Implements RESTful routes for CRUD operations, search, and upcoming birthdays.
 """
-from typing import List
-from fastapi import APIRouter, Depends, Query
-from fastapi.security import OAuth2PasswordBearer
+from typing import List, Optional
+from fastapi import APIRouter, Body, Depends, Query, Response
 from sqlalchemy.orm import Session
-from app.database import SessionLocal
+from app.database import pool_status
+from app.deps import get_current_user, get_current_user_id, get_db, require_admin
 from app.schemas.contact import ContactCreate, ContactUpdate, ContactOut
-from app.crud.contact import create_contact, get_contacts, get_contact, update_contact, delete_contact, search_contacts, get_upcoming_birthdays
+from app.utils.cache import cache_contact, delete_contact_cache, get_cached_contact
+from app.crud.contact import bulk_create_contacts, create_contact, get_contacts, get_contact, update_contact, delete_contact, search_contacts, get_upcoming_birthdays
 
 router = APIRouter(prefix="/contacts", tags=["contacts"])
-oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/users/login")
 
 
-def get_db():
-    """Provide a SQLAlchemy session for request lifecycle.
-
-    Yields:
-        Session: Database session that is closed after request is handled.
-    """
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-
-@router.post("/", response_model=ContactOut)
-async def create_contact_route(contact: ContactCreate, token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+@router.post("/", response_model=ContactOut, response_model_exclude_none=True)
+def create_contact_route(contact: ContactCreate, current_user_id: int = Depends(get_current_user_id), db: Session = Depends(get_db)):
     """Create a new contact for the authenticated user.
 
     Args:
         contact: Contact payload.
-        token: Bearer access token.
+        current_user_id: Id of the authenticated user.
         db: SQLAlchemy session.
     """
-    return create_contact(db, contact, token)
+    return create_contact(db, contact, current_user_id)
+
+
+@router.post("/bulk", response_model=List[ContactOut], response_model_exclude_none=True)
+def bulk_create_contacts_route(
+    contacts: List[ContactCreate] = Body(..., min_length=1, max_length=100),
+    current_user_id: int = Depends(get_current_user_id),
+    db: Session = Depends(get_db),
+):
+    """Create up to 100 contacts at once; the batch fails as a whole on a duplicate email."""
+    return bulk_create_contacts(db, contacts, current_user_id)
+
+
+@router.get("/", response_model=List[ContactOut], response_model_exclude_none=True)
+def list_contacts(
+    response: Response,
+    after_id: Optional[int] = Query(None, description="Return contacts with an id greater than this cursor"),
+    limit: int = Query(100, ge=1, le=100, description="Page size; follow X-Next-Cursor for more"),
+    skip: int = Query(0, ge=0, deprecated=True, description="Offset pagination; use after_id instead"),
+    current_user_id: int = Depends(get_current_user_id),
+    db: Session = Depends(get_db),
+):
+    """List contacts ordered by id with keyset pagination.
+
+    Pages hold at most 100 contacts, which bounds the memory used per
+    request. When a full page is returned, the ``X-Next-Cursor`` header
+    carries the ``after_id`` value for the next page.
+    """
+    rows = get_contacts(db, current_user_id, skip=skip, limit=limit, after_id=after_id)
+    if rows and len(rows) == limit:
+        response.headers["X-Next-Cursor"] = str(rows[-1]["id"])
+    return rows
 
 
-@router.get("/", response_model=List[ContactOut])
-async def list_contacts(skip: int = 0, limit: int = 100, token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
-    """List contacts with pagination."""
-    return get_contacts(db, skip=skip, limit=limit, token=token)
+@router.get("/search", response_model=List[ContactOut], response_model_exclude_none=True)
+def search_contacts_route(
+    q: str = Query(..., min_length=1, description="Search query"),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=100),
+    current_user_id: int = Depends(get_current_user_id),
+    db: Session = Depends(get_db),
+):
+    """Search contacts by name, email or phone, at most ``limit`` matches per page."""
+    return search_contacts(db, q, current_user_id, skip=skip, limit=limit)
 
 
-@router.get("/search", response_model=List[ContactOut])
-async def search_contacts_route(q: str = Query(..., min_length=1, description="Search query"), token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
-    """Search contacts by name, email or phone."""
-    return search_contacts(db, q, token)
+@router.get("/pool-health")
+def pool_health(current_user: dict = Depends(get_current_user), db: Session = Depends(get_db)):
+    """Report database connection pool usage (active/idle connections) to admins.
+
+    Args:
+        current_user: Authenticated user's profile.
+        db: SQLAlchemy session, only used to re-check a non-admin cached role.
+    """
+    require_admin(db, current_user, "Only admin can view pool health")
+    return pool_status()
 
 
-@router.get("/{contact_id}", response_model=ContactOut)
-async def get_contact_route(contact_id: int, token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
-    """Retrieve a single contact by id."""
-    return get_contact(db, contact_id, token)
+@router.get("/{contact_id}", response_model=ContactOut, response_model_exclude_none=True)
+def get_contact_route(contact_id: int, current_user_id: int = Depends(get_current_user_id), db: Session = Depends(get_db)):
+    """Retrieve a single contact by id, served from Redis for up to a minute after a read.
+
+    The cache holds the encoded response body, so hits are returned as-is
+    without validating or serializing the contact again.
+    """
+    cached = get_cached_contact(current_user_id, contact_id)
+    if cached:
+        return Response(cached, media_type="application/json")
+    body = ContactOut.model_validate(get_contact(db, contact_id, current_user_id)).model_dump_json(exclude_none=True)
+    cache_contact(current_user_id, contact_id, body)
+    return Response(body, media_type="application/json")
 
 
-@router.put("/{contact_id}", response_model=ContactOut)
-async def update_contact_route(contact_id: int, contact: ContactUpdate, token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+@router.put("/{contact_id}", response_model=ContactOut, response_model_exclude_none=True)
+def update_contact_route(contact_id: int, contact: ContactUpdate, current_user_id: int = Depends(get_current_user_id), db: Session = Depends(get_db)):
     """Update an existing contact."""
-    return update_contact(db, contact_id, contact, token)
+    updated = update_contact(db, contact_id, contact, current_user_id)
+    delete_contact_cache(current_user_id, contact_id)
+    return updated
 
 
 @router.delete("/{contact_id}", response_model=bool)
-async def delete_contact_route(contact_id: int, token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+def delete_contact_route(contact_id: int, current_user_id: int = Depends(get_current_user_id), db: Session = Depends(get_db)):
     """Delete a contact by id."""
-    return delete_contact(db, contact_id, token)
+    deleted = delete_contact(db, contact_id, current_user_id)
+    delete_contact_cache(current_user_id, contact_id)
+    return deleted
 
 
-@router.get("/birthdays/upcoming", response_model=List[ContactOut])
-async def upcoming_birthdays_route(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+@router.get("/birthdays/upcoming", response_model=List[ContactOut], response_model_exclude_none=True)
+def upcoming_birthdays_route(current_user_id: int = Depends(get_current_user_id), db: Session = Depends(get_db)):
     """Get contacts with birthdays in the next 7 days."""
-    return get_upcoming_birthdays(db, token)
+    return get_upcoming_birthdays(db, current_user_id)
@@ -2,20 +2,17 @@
 FastAPI router for user registration, login, email verification, avatar update, and /me endpoint with rate limiting.
 """
 import os
-import smtplib
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Body
-from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, status, UploadFile, File, Body
+from fastapi.security import OAuth2PasswordRequestForm
+from sqlalchemy import update
 from sqlalchemy.orm import Session
-from slowapi import Limiter
-from slowapi.util import get_remote_address
 import cloudinary
 import cloudinary.uploader
-from app.database import SessionLocal
+from app.deps import get_current_user, get_db, require_admin, user_cache_payload
 from app.schemas.user import UserCreate, UserOut, Token
 from app.crud.user import create_user, authenticate_user, verify_user_email, update_avatar
 from app.utils.auth import (
     create_access_token,
-    decode_access_token,
     send_verification_email,
     get_password_hash,
     create_refresh_token,
@@ -25,45 +22,64 @@ from app.utils.auth import (
     send_reset_email,
 )
 from app.models.user import User
-from app.utils.cache import cache_user, get_cached_user, delete_user_cache, update_user_cache
+from app.utils.ratelimit import rate_limit
+from app.utils.cache import cache_user, update_user_cache
+
+# Configure Cloudinary once per process; app.database has already loaded the .env file.
+if os.getenv("SPHINX_BUILD") != "True":
+    cloudinary.config(
+        cloud_name=os.getenv("CLOUDINARY_CLOUD_NAME"),
+        api_key=os.getenv("CLOUDINARY_API_KEY"),
+        api_secret=os.getenv("CLOUDINARY_API_SECRET"),
+    )
 
 router = APIRouter(prefix="/users", tags=["users"])
-_limiter = Limiter(key_func=get_remote_address)
-oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/users/login")
 
 
-def get_db():
-    """Provide a SQLAlchemy session for request lifecycle."""
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+# Files above this size are sent to Cloudinary in chunks instead of one request
+_LARGE_UPLOAD_THRESHOLD = 5 * 1024 * 1024
+_UPLOAD_CHUNK_SIZE = 6_000_000
+# Very large files use bigger chunks to cut the number of upload requests
+_HUGE_UPLOAD_THRESHOLD = 100 * 1024 * 1024
+_HUGE_UPLOAD_CHUNK_SIZE = 20 * 1024 * 1024
+
+
+def _upload_avatar(file: UploadFile) -> dict:
+    """Upload an avatar to Cloudinary, chunking large files (blocking)."""
+    size = file.size
+    if size is None:
+        file.file.seek(0, os.SEEK_END)
+        size = file.file.tell()
+    file.file.seek(0)
+    if size > _LARGE_UPLOAD_THRESHOLD:
+        chunk_size = _HUGE_UPLOAD_CHUNK_SIZE if size > _HUGE_UPLOAD_THRESHOLD else _UPLOAD_CHUNK_SIZE
+        return cloudinary.uploader.upload_large(file.file, chunk_size=chunk_size, resource_type="image")
+    return cloudinary.uploader.upload(file.file)
 
 
 @router.post("/register", response_model=UserOut, status_code=status.HTTP_201_CREATED)
-async def register(user: UserCreate, db: Session = Depends(get_db)):
+def register(user: UserCreate, background_tasks: BackgroundTasks, db: Session = Depends(get_db)):
     """Register a new user and return the created profile.
 
+    The verification email is sent after the response, so SMTP latency does
+    not delay registration.
+
     Args:
         user: Registration payload (username, email, password).
+        background_tasks: Queue for work performed after the response is sent.
         db: Database session dependency.
 
     Returns:
         The created user profile.
     """
     created = create_user(db, user)
-    # Optionally send verification email (best-effort).
-    try:
-        send_verification_email(created.email, created.id)
-    except smtplib.SMTPException:
-        # Non-fatal for registration; log in real app
-        pass
+    # Best-effort: send_verification_email reports SMTP failures by returning False
+    background_tasks.add_task(send_verification_email, created.email, created.id)
     return created
 
 
-@router.post("/login", response_model=Token)
-async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+@router.post("/login", response_model=Token, dependencies=[Depends(rate_limit("login"))])
+def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
     """Authenticate user and return access and refresh tokens.
 
     Args:
@@ -76,7 +92,7 @@ async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session =
     user = authenticate_user(db, form_data.username, form_data.password)
     access = create_access_token({"user_id": user.id, "email": user.email})
     refresh_token = create_refresh_token({"user_id": user.id, "email": user.email})
-    cache_user(user.id, {"id": user.id, "username": user.username, "email": user.email, "role": user.role})
+    cache_user(user.id, user_cache_payload(user))
     return {"access_token": access, "token_type": "bearer", "refresh_token": refresh_token}
 
 
@@ -98,7 +114,7 @@ async def refresh(token: str = Body(..., embed=True, description="Refresh token"
 
 
 @router.get("/verify/{user_id}", response_model=UserOut)
-async def verify_email(user_id: int, db: Session = Depends(get_db)):
+def verify_email(user_id: int, db: Session = Depends(get_db)):
     """Verify a user's email address.
 
     Marks the specified user's email as verified and refreshes their cache entry.
@@ -113,23 +129,22 @@ async def verify_email(user_id: int, db: Session = Depends(get_db)):
     user = verify_user_email(db, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
-    # Invalidate and refresh the cache after verification
-    delete_user_cache(user.id)
-    update_user_cache(user.id, {"user_id": user.id, "email": user.email, "role": user.role})
+    # Refresh the cache after verification (SETEX overwrites the old entry)
+    update_user_cache(user.id, user_cache_payload(user))
     return user
 
 
 @router.post("/avatar", response_model=UserOut)
-async def update_user_avatar(
-    token: str = Depends(oauth2_scheme),
+def update_user_avatar(
     file: UploadFile = File(...),
+    current_user: dict = Depends(get_current_user),
     db: Session = Depends(get_db),
 ):
     """Upload and set a new avatar for the authenticated admin user.
 
     Args:
-        token: Bearer access token; must belong to an admin user.
         file: Image file to upload to Cloudinary.
+        current_user: Cached profile of the requester; must be an admin.
         db: Database session dependency.
 
     Returns:
@@ -140,65 +155,47 @@ async def update_user_avatar(
     """
     if file is None:
         raise HTTPException(status_code=422, detail="File required")
-    payload = decode_access_token(token)
-    if not payload:
-        raise HTTPException(status_code=401, detail="Invalid token")
-    user_id = payload.get("user_id")
-    user = db.query(User).filter(User.id == user_id).first()
-    if not user or user.role != "admin":
-        raise HTTPException(status_code=403, detail="Only admin can change avatar")
-    cloudinary.config(
-        cloud_name=os.getenv("CLOUDINARY_CLOUD_NAME"),
-        api_key=os.getenv("CLOUDINARY_API_KEY"),
-        api_secret=os.getenv("CLOUDINARY_API_SECRET"),
-    )
-    result = cloudinary.uploader.upload(file.file)
+    user_id = current_user["id"]
+    require_admin(db, current_user, "Only admin can change avatar")
+    # Return the connection to the pool for the duration of the upload
+    db.close()
+    result = _upload_avatar(file)
     avatar_url = result.get("secure_url")
     user = update_avatar(db, user_id, avatar_url)
     # Avatar changed: refresh cache entry
-    delete_user_cache(user.id)
-    update_user_cache(user.id, {"user_id": user.id, "email": user.email, "role": user.role})
+    update_user_cache(user.id, user_cache_payload(user))
     return user
 
 
-@router.get("/me", response_model=UserOut)
-# @limiter.limit("5/minute")
-async def get_me(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+@router.get("/me", response_model=UserOut, dependencies=[Depends(rate_limit("me", rate=1, cap=30))])
+async def get_me(current_user: dict = Depends(get_current_user)):
     """Return current authenticated user's profile.
 
-    Attempts to use the Redis cache to reduce database load.
+    Served straight from the Redis cache on a hit; the database is only
+    queried on a miss, which also primes the cache.
 
     Args:
-        token: Bearer access token.
-        db: Database session dependency.
+        current_user: Cached profile of the authenticated user.
 
     Returns:
         The user profile of the current user.
     """
-    payload = decode_access_token(token)
-    if not payload:
-        raise HTTPException(status_code=401, detail="Invalid token")
-    cached = get_cached_user(payload.get("user_id"))
-    if cached:
-        user = db.query(User).filter(User.id == cached.get("user_id")).first()
-        if user:
-            return user
-    user = db.query(User).filter(User.id == payload.get("user_id")).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-    # Prime cache if missing
-    update_user_cache(user.id, {"user_id": user.id, "email": user.email, "role": user.role})
-    return user
+    return current_user
 
 
-@router.post("/request-reset", status_code=200)
-async def request_password_reset(email: str = Body(..., embed=True), db: Session = Depends(get_db)):
+@router.post("/request-reset", status_code=200, dependencies=[Depends(rate_limit("request-reset"))])
+def request_password_reset(
+    background_tasks: BackgroundTasks,
+    email: str = Body(..., embed=True),
+    db: Session = Depends(get_db),
+):
     """Initiate the password reset flow for a user.
 
     Generates a short-lived reset token and sends reset instructions to the email
     if the account exists (response is generic to avoid account enumeration).
 
     Args:
+        background_tasks: Queue for work performed after the response is sent.
         email: Email address of the account.
         db: Database session dependency.
 
@@ -210,8 +207,8 @@ async def request_password_reset(email: str = Body(..., embed=True), db: Session
         # Do not disclose whether the email exists; respond generically
         return {"msg": "If the account exists, reset instructions have been sent."}
     token = create_reset_token(user.id)
-    # Send email with reset link/token
-    send_reset_email(user.email, token)
+    # Send email with reset link/token once the response is on its way
+    background_tasks.add_task(send_reset_email, user.email, token)
     # In test environments expose token to facilitate e2e tests
     if os.getenv("TESTING") == "1":
         return {"msg": "Reset token generated", "reset_token": token}
@@ -219,7 +216,7 @@ async def request_password_reset(email: str = Body(..., embed=True), db: Session
 
 
 @router.post("/reset-password", status_code=200)
-async def reset_password(
+def reset_password(
     reset_token: str = Body(..., embed=True),
     new_password: str = Body(..., embed=True),
     db: Session = Depends(get_db),
@@ -237,19 +234,20 @@ async def reset_password(
     user_id = verify_reset_token(reset_token)
     if not user_id:
         raise HTTPException(status_code=400, detail="Invalid or expired token")
-    user = db.query(User).filter(User.id == user_id).first()
-    if not user:
+    # Hash before touching the database so no connection is held meanwhile
+    hashed_password = get_password_hash(new_password)
+    stmt = update(User).where(User.id == user_id).values(hashed_password=hashed_password).returning(User.id)
+    if db.scalar(stmt) is None:
         raise HTTPException(status_code=404, detail="User not found")
-    user.hashed_password = get_password_hash(new_password)
     db.commit()
     return {"msg": "Password updated"}
 
 
 @router.post("/set-role", response_model=UserOut)
-async def set_role(
+def set_role(
     user_id: int,
     role: str,
-    token: str = Depends(oauth2_scheme),
+    current_user: dict = Depends(get_current_user),
     db: Session = Depends(get_db),
 ):
     """Change a user's role (admin-only).
@@ -257,36 +255,24 @@ async def set_role(
     Args:
         user_id: ID of the target user.
         role: Desired role, one of {"user", "admin"}.
-        token: Bearer access token of the requester; must belong to an admin.
+        current_user: Cached profile of the requester; must be an admin.
         db: Database session dependency.
 
     Returns:
         The updated user profile.
     """
-    # Decode requester token
-    payload = decode_access_token(token)
-    if not payload:
-        raise HTTPException(status_code=401, detail="Invalid token")
-    requester_id = payload.get("user_id")
-    requester = db.query(User).filter(User.id == requester_id).first()
-    if not requester:
-        raise HTTPException(status_code=404, detail="Requester not found")
     # Only admins may change roles
-    if requester.role != "admin":
-        raise HTTPException(status_code=403, detail="Only admin can change user roles")
+    require_admin(db, current_user, "Only admin can change user roles")
 
-    # Validate target user and role
-    target = db.query(User).filter(User.id == user_id).first()
-    if not target:
-        raise HTTPException(status_code=404, detail="User not found")
     if role not in ("user", "admin"):
         raise HTTPException(status_code=400, detail="Invalid role")
 
-    # Apply role change
-    target.role = role
+    # Apply the role change and read the updated row back in one statement
+    stmt = update(User).where(User.id == user_id).values(role=role).returning(User)
+    target = db.scalars(stmt).one_or_none()
+    if not target:
+        raise HTTPException(status_code=404, detail="User not found")
     db.commit()
-    db.refresh(target)
     # Update cache for target
-    delete_user_cache(target.id)
-    update_user_cache(target.id, {"user_id": target.id, "email": target.email, "role": target.role})
+    update_user_cache(target.id, user_cache_payload(target))
     return target
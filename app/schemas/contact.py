@@ -4,13 +4,18 @@ Defines base, create, update, and output schemas for contacts.
 """
 from typing import Optional
 from datetime import date
-from pydantic import BaseModel, EmailStr, Field
+from pydantic import BaseModel, Field
+
+# Contact addresses are stored, never mailed, so a structural check suffices;
+# it is far cheaper than EmailStr's full RFC grammar parse on every request.
+# pydantic-core compiles the pattern once, when the schema is built.
+EMAIL_PATTERN = r"^[^@\s]+@[^@\s]+\.[^@\s]+$"
 
 class ContactBase(BaseModel):
     """Base schema for contact information."""
     first_name: str = Field(..., json_schema_extra={"example": "John"})
     last_name: str = Field(..., json_schema_extra={"example": "Doe"})
-    email: EmailStr
+    email: str = Field(..., pattern=EMAIL_PATTERN, json_schema_extra={"example": "john@example.com"})
     phone: str
     birthday: date
     extra: Optional[str] = None
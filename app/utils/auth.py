@@ -1,15 +1,20 @@
 """
 Utility functions for password hashing, JWT token creation, email verification, refresh/access/reset tokens.
 """
+import hashlib
 import os
 import smtplib
+import threading
+import time
 from datetime import datetime, timedelta, timezone
 from typing import Optional, Dict, Any
 from email.mime.text import MIMEText
 
-from passlib.context import CryptContext
+import bcrypt
+from cachetools import TLRUCache
+from argon2 import PasswordHasher
+from argon2.exceptions import InvalidHashError, VerificationError
 from jose import jwt, JWTError
-from email_validator import validate_email, EmailNotValidError
 
 SECRET_KEY = os.getenv('SECRET_KEY', 'supersecretkey')
 ALGORITHM = 'HS256'
@@ -19,11 +24,17 @@ REFRESH_TOKEN_EXPIRE_DAYS = 7
 RESET_SECRET_KEY = os.getenv('RESET_SECRET_KEY', SECRET_KEY)
 RESET_TOKEN_EXPIRE_MINUTES = 15
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# argon2id with explicitly tuned cost (OWASP minimum profile: 19 MiB, t=2, p=1).
+# The test environment lowers the cost through ARGON2_TIME_COST/ARGON2_MEMORY_COST.
+password_hasher = PasswordHasher(
+    time_cost=int(os.getenv('ARGON2_TIME_COST', '2')),
+    memory_cost=int(os.getenv('ARGON2_MEMORY_COST', '19456')),
+    parallelism=1,
+)
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    """Verify a plain password against a bcrypt hash.
+    """Verify a plain password against an argon2id or legacy bcrypt hash.
 
     Returns
     -------
@@ -31,13 +42,33 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
         True if the password matches the hash, False otherwise.
     """
     try:
-        return pwd_context.verify(plain_password, hashed_password)
-    except (ValueError, TypeError):
+        if hashed_password.startswith("$argon2"):
+            return password_hasher.verify(hashed_password, plain_password)
+        # Hashes created before the switch to argon2id
+        return bcrypt.checkpw(plain_password.encode("utf-8"), hashed_password.encode("utf-8"))
+    except (VerificationError, InvalidHashError, ValueError, TypeError):
         return False
 
 
+# Checked against when a login names an unknown user, so that path costs the
+# same hash verification as a wrong password and cannot be told apart by timing.
+_DUMMY_HASH = password_hasher.hash("dummy-password")
+
+
+def verify_dummy_password(password: str) -> None:
+    """Spend one hash verification on ``password`` and discard the result."""
+    verify_password(password, _DUMMY_HASH)
+
+
+def password_needs_rehash(hashed_password: str) -> bool:
+    """Return True if the hash is legacy bcrypt or uses outdated argon2 parameters."""
+    if not hashed_password.startswith("$argon2"):
+        return True
+    return password_hasher.check_needs_rehash(hashed_password)
+
+
 def get_password_hash(password: str) -> str:
-    """Hash a password using bcrypt.
+    """Hash a password using argon2id.
 
     Parameters
     ----------
@@ -47,9 +78,9 @@ def get_password_hash(password: str) -> str:
     Returns
     -------
     str
-        Bcrypt hash string.
+        Argon2id hash string.
     """
-    return pwd_context.hash(password)
+    return password_hasher.hash(password)
 
 
 def _encode(data: Dict[str, Any], key: str, expires_delta: Optional[timedelta] = None) -> str:
@@ -77,33 +108,42 @@ def decode_access_token(token: str) -> Optional[Dict[str, Any]]:
     return _decode(token, SECRET_KEY)
 
 
-# -- Redis-backed current user helper --
-try:
-    # Import lazily to avoid hard dependency during certain test runs
-    from app.utils.cache import get_cached_user as _get_cached_user  # type: ignore
-except ImportError:
-    def _get_cached_user(_user_id: int):  # type: ignore
-        """Stubbed cache getter when Redis is unavailable."""
-        return None
+# Resolved user ids keyed by a truncated SHA-256 of the access token, so
+# repeated requests with the same bearer token skip signature verification and
+# payload parsing. Each entry is ``(user_id, exp)`` and expires after
+# ``_ACCESS_CACHE_TTL`` seconds or at the token's own ``exp``, whichever comes
+# first. Invalid tokens are never cached.
+_ACCESS_CACHE_TTL = 60
+
+
+def _access_cache_ttu(_key, entry: tuple, now: float) -> float:
+    return min(now + _ACCESS_CACHE_TTL, entry[1])
+
 
+_access_cache = TLRUCache(maxsize=10000, ttu=_access_cache_ttu, timer=time.time)
+_access_cache_lock = threading.Lock()
 
-def get_current_user(token: str) -> Optional[Dict[str, Any]]:
-    """Return current user data from Redis cache using the JWT access token.
 
-    This avoids hitting the database on every request. If token is invalid or
-    cache miss occurs, returns None. Ensure login flow caches user data.
+def access_token_user_id(token: str) -> Optional[int]:
+    """Return the user id of a valid access token, or None.
+
+    Only the first request carrying a given token pays for verification; a
+    cache hit returns the stored int without touching the payload.
     """
+    key = hashlib.sha256(token.encode()).digest()[:16]
+    with _access_cache_lock:
+        cached = _access_cache.get(key)
+    if cached is not None:
+        return cached[0]
     payload = decode_access_token(token)
-    if not payload:
-        return None
-    user_id = payload.get("user_id")
-    if user_id is None:
+    if not payload or not payload.get("user_id"):
         return None
-    cached = _get_cached_user(int(user_id))
-    # Optional safety check: ensure cached email matches token
-    if cached and cached.get("email") == payload.get("email"):
-        return cached
-    return None
+    user_id = int(payload["user_id"])  # enforce int
+    exp = payload.get("exp", 0)
+    if exp > time.time():
+        with _access_cache_lock:
+            _access_cache[key] = (user_id, exp)
+    return user_id
 
 
 def create_refresh_token(data: Dict[str, Any], expires_delta: Optional[timedelta] = None) -> str:
@@ -129,43 +169,111 @@ def verify_reset_token(token: str) -> Optional[int]:
     return payload.get("user_id")
 
 
+# One idle SMTP session per worker, reused across messages so the TCP/TLS/AUTH
+# handshake is paid once rather than per email. A sender takes the session out
+# of the pool and returns it afterwards; the lock only guards that hand-over,
+# so a slow server never blocks other threads waiting on the lock. Concurrent
+# senders open their own session, and the surplus is closed on return.
+_SMTP_IDLE_TIMEOUT = 60
+# Socket timeout for connect, handshake and each SMTP command
+SMTP_TIMEOUT = float(os.getenv("SMTP_TIMEOUT", "10"))
+_smtp_lock = threading.Lock()
+_smtp_pool: Dict[str, Any] = {"server": None, "last_used": 0.0}
+
+
+def _smtp_connect() -> smtplib.SMTP:
+    """Open and authenticate a new SMTP session from environment settings."""
+    server = smtplib.SMTP(
+        os.getenv("SMTP_HOST", "localhost"), int(os.getenv("SMTP_PORT", "1025")), timeout=SMTP_TIMEOUT
+    )
+    try:
+        if os.getenv("SMTP_TLS", "0") == "1":
+            server.starttls()
+        user = os.getenv("SMTP_USER")
+        # Support both SMTP_PASSWORD and SMTP_PASS variable names
+        pwd = os.getenv("SMTP_PASSWORD") or os.getenv("SMTP_PASS")
+        if user and pwd:
+            server.login(user, pwd)
+    except (smtplib.SMTPException, OSError):
+        server.close()
+        raise
+    return server
+
+
+def _smtp_quit(server: smtplib.SMTP) -> None:
+    try:
+        server.quit()
+    except (smtplib.SMTPException, OSError):
+        server.close()
+
+
+def _checkout_smtp() -> smtplib.SMTP:
+    """Take the pooled SMTP session if it is still usable, else open a new one."""
+    with _smtp_lock:
+        server = _smtp_pool["server"]
+        last_used = _smtp_pool["last_used"]
+        _smtp_pool["server"] = None
+    if server is not None:
+        try:
+            if time.monotonic() - last_used < _SMTP_IDLE_TIMEOUT and server.noop()[0] == 250:
+                return server
+        except (smtplib.SMTPException, OSError):
+            pass
+        _smtp_quit(server)
+    return _smtp_connect()
+
+
+def _checkin_smtp(server: smtplib.SMTP) -> None:
+    """Return a healthy session to the pool, closing it if the pool is already full."""
+    with _smtp_lock:
+        if _smtp_pool["server"] is None:
+            _smtp_pool["server"] = server
+            _smtp_pool["last_used"] = time.monotonic()
+            return
+    _smtp_quit(server)
+
+
+def close_smtp() -> None:
+    """Close the pooled SMTP session, if any. Call on application shutdown."""
+    with _smtp_lock:
+        server = _smtp_pool["server"]
+        _smtp_pool["server"] = None
+    if server is not None:
+        _smtp_quit(server)
+
+
 def _smtp_send(to_email: str, subject: str, body: str) -> bool:
     """Internal helper to send an email using environment-configured SMTP.
 
-    Respects SMTP_HOST, SMTP_PORT, SMTP_TLS, SMTP_USER and either SMTP_PASSWORD or SMTP_PASS, and SMTP_FROM.
+    Respects SMTP_HOST, SMTP_PORT, SMTP_TLS, SMTP_USER and either SMTP_PASSWORD or SMTP_PASS, SMTP_FROM
+    and SMTP_TIMEOUT. The session is kept open and reused by subsequent calls; see ``close_smtp``.
     """
     msg = MIMEText(body)
     msg["Subject"] = subject
     msg["To"] = to_email
     msg["From"] = os.getenv("SMTP_FROM", "noreply@example.com")
 
-    host = os.getenv("SMTP_HOST", "localhost")
-    port = int(os.getenv("SMTP_PORT", "1025"))
+    server = None
     try:
-        with smtplib.SMTP(host, port) as server:
-            if os.getenv("SMTP_TLS", "0") == "1":
-                server.starttls()
-            user = os.getenv("SMTP_USER")
-            # Support both SMTP_PASSWORD and SMTP_PASS variable names
-            pwd = os.getenv("SMTP_PASSWORD") or os.getenv("SMTP_PASS")
-            if user and pwd:
-                server.login(user, pwd)
-            server.sendmail(msg["From"], [to_email], msg.as_string())
-        return True
+        server = _checkout_smtp()
+        server.sendmail(msg["From"], [to_email], msg.as_string())
     except (smtplib.SMTPException, OSError):
+        if server is not None:
+            server.close()
         return False
+    _checkin_smtp(server)
+    return True
 
 
 def send_verification_email(to_email: str, user_id: int) -> bool:
     """Send a simple verification email containing a link with the user_id. Returns True on success.
 
-    This function validates the email, builds a message and attempts to send via SMTP.
-    It is intentionally simple to allow unit tests to mock smtplib.SMTP.
+    Addresses are validated by the ``EmailStr`` schemas before they are stored,
+    so only an obviously malformed value is rejected here. The function builds a
+    message and attempts to send via SMTP; it is intentionally simple to allow
+    unit tests to mock smtplib.SMTP.
     """
-    # Validate email syntax only (no DNS lookups)
-    try:
-        validate_email(to_email, check_deliverability=False)
-    except EmailNotValidError:
+    if "@" not in to_email:
         return False
 
     subject = "Verify your email"
@@ -178,9 +286,7 @@ def send_reset_email(to_email: str, reset_token: str) -> bool:
 
     The link path can be configured via RESET_URL_BASE or defaults to /users/reset-password.
     """
-    try:
-        validate_email(to_email, check_deliverability=False)
-    except EmailNotValidError:
+    if "@" not in to_email:
         return False
 
     base = os.getenv("RESET_URL_BASE", "")
@@ -1,32 +1,38 @@
 """
-Simple Redis cache utilities for storing and retrieving current user data.
+Simple Redis cache utilities for storing and retrieving current user data
+and individual contacts.
 """
 import os
-import json
 from typing import Optional
 
+import orjson
 import redis
 from redis.exceptions import RedisError
 
 REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+# Prepended to every key, so that several deployments (or a test run) can share
+# one Redis database and clear only their own entries.
+KEY_PREFIX = os.getenv("REDIS_KEY_PREFIX", "")
+
+# Shared pool sized for concurrent requests; callers wait up to 1s for a free
+# connection instead of failing. No connection is opened until first use.
+_pool = redis.BlockingConnectionPool.from_url(
+    REDIS_URL,
+    max_connections=64,
+    timeout=1.0,
+    decode_responses=True,
+    socket_keepalive=True,
+)
+_client = redis.Redis(connection_pool=_pool)
 
-# Lazy singleton for Redis client without using `global` reassignment
-def _client_singleton():
-    client: Optional[redis.Redis] = None
 
-    def get() -> redis.Redis:
-        nonlocal client
-        if client is None:
-            client = redis.from_url(REDIS_URL, decode_responses=True)
-        return client
-
-    return get
+def get_client() -> redis.Redis:
+    """Return the shared Redis client backed by the connection pool."""
+    return _client
 
-_get_client = _client_singleton()
 
-def get_client() -> redis.Redis:
-    """Return a cached Redis client instance."""
-    return _get_client()
+def _user_key(user_id: int) -> str:
+    return f"{KEY_PREFIX}user:{user_id}"
 
 
 def cache_user(user_id: int, data: dict, ttl_seconds: int = 1800) -> None:
@@ -38,8 +44,8 @@ def cache_user(user_id: int, data: dict, ttl_seconds: int = 1800) -> None:
         ttl_seconds: Time-to-live in seconds (default 1800 = 30 minutes).
     """
     client = get_client()
-    key = f"user:{user_id}"
-    client.setex(key, ttl_seconds, json.dumps(data))
+    key = _user_key(user_id)
+    client.setex(key, ttl_seconds, orjson.dumps(data))
 
 
 def get_cached_user(user_id: int) -> Optional[dict]:
@@ -52,13 +58,13 @@ def get_cached_user(user_id: int) -> Optional[dict]:
         The cached user data as a dictionary if present and valid, otherwise None.
     """
     client = get_client()
-    key = f"user:{user_id}"
+    key = _user_key(user_id)
     val = client.get(key)
     if not val:
         return None
     try:
-        return json.loads(val)
-    except json.JSONDecodeError:
+        return orjson.loads(val)
+    except orjson.JSONDecodeError:
         return None
 
 
@@ -68,7 +74,7 @@ def delete_user_cache(user_id: int) -> None:
     Call this after sensitive changes (email, role, avatar) to avoid stale data.
     """
     client = get_client()
-    key = f"user:{user_id}"
+    key = _user_key(user_id)
     try:
         client.delete(key)
     except RedisError:
@@ -79,3 +85,42 @@ def delete_user_cache(user_id: int) -> None:
 def update_user_cache(user_id: int, data: dict, ttl_seconds: int = 1800) -> None:
     """Convenience wrapper to update cache atomically."""
     cache_user(user_id, data, ttl_seconds)
+
+
+CONTACT_CACHE_TTL = 60
+
+
+def _contact_key(user_id: int, contact_id: int) -> str:
+    return f"{KEY_PREFIX}contact:{user_id}:{contact_id}"
+
+
+def cache_contact(user_id: int, contact_id: int, payload: str, ttl_seconds: int = CONTACT_CACHE_TTL) -> None:
+    """Cache a contact's serialized JSON for its owner (best-effort).
+
+    Args:
+        user_id: Owner of the contact.
+        contact_id: The contact's primary key.
+        payload: The encoded ``ContactOut`` response body (null fields omitted).
+        ttl_seconds: Time-to-live in seconds (default 60).
+    """
+    try:
+        get_client().setex(_contact_key(user_id, contact_id), ttl_seconds, payload)
+    except RedisError:
+        pass
+
+
+def get_cached_contact(user_id: int, contact_id: int) -> Optional[str]:
+    """Return a contact's cached JSON, or None on a miss or Redis error."""
+    try:
+        return get_client().get(_contact_key(user_id, contact_id))
+    except RedisError:
+        return None
+
+
+def delete_contact_cache(user_id: int, contact_id: int) -> None:
+    """Remove a contact's cache entry after it is updated or deleted."""
+    try:
+        get_client().delete(_contact_key(user_id, contact_id))
+    except RedisError:
+        # Best-effort; the entry expires on its own within the TTL
+        pass
@@ -0,0 +1,124 @@
+"""
+In-process token-bucket rate limiting for sensitive endpoints.
+
+Buckets live in worker memory, so each check is a dictionary lookup and a
+little float arithmetic instead of a round-trip to Redis or the database.
+Limits apply per worker process.
+"""
+import os
+import threading
+import time
+from typing import Callable, Dict
+
+from fastapi import HTTPException, Request, status
+
+# Idle buckets are pruned once this many keys are tracked
+_MAX_BUCKETS = 10000
+
+# Request header holding the real client address when the app runs behind a
+# proxy that sets it and discards client-supplied copies (``Fly-Client-IP`` on
+# fly.io). Unset, the socket peer address is used.
+CLIENT_IP_HEADER = os.getenv("CLIENT_IP_HEADER")
+
+
+class TokenBucket:
+    """A bucket refilled continuously at ``rate`` tokens per second.
+
+    Parameters
+    ----------
+    rate : float
+        Tokens added per second.
+    cap : float
+        Maximum number of tokens the bucket can hold (burst size).
+    """
+
+    __slots__ = ("tokens", "last", "rate", "cap")
+
+    def __init__(self, rate: float, cap: float):
+        self.tokens = cap
+        self.last = time.monotonic()
+        self.rate = rate
+        self.cap = cap
+
+    def allow(self) -> bool:
+        """Consume one token if available.
+
+        Returns
+        -------
+        bool
+            True if the request may proceed, False if the bucket is empty.
+        """
+        now = time.monotonic()
+        self.tokens = min(self.cap, self.tokens + (now - self.last) * self.rate)
+        self.last = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+    def is_full(self, now: float) -> bool:
+        """Return True if the bucket would be full at ``now`` (i.e. idle)."""
+        return self.tokens + (now - self.last) * self.rate >= self.cap
+
+
+_buckets: Dict[str, TokenBucket] = {}
+_lock = threading.Lock()
+
+
+def _prune(now: float) -> None:
+    """Drop buckets that have refilled completely; they carry no state."""
+    for key in [k for k, b in _buckets.items() if b.is_full(now)]:
+        del _buckets[key]
+
+
+def hit(key: str, rate: float, cap: float) -> bool:
+    """Record a request for ``key`` and report whether it is allowed."""
+    with _lock:
+        bucket = _buckets.get(key)
+        if bucket is None:
+            if len(_buckets) >= _MAX_BUCKETS:
+                _prune(time.monotonic())
+            bucket = _buckets[key] = TokenBucket(rate, cap)
+        return bucket.allow()
+
+
+def enforce(key: str, rate: float, cap: float) -> None:
+    """Record a request for ``key`` and raise 429 if its bucket is empty."""
+    if not hit(key, rate, cap):
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many requests",
+        )
+
+
+def client_ip(request: Request) -> str:
+    """Return the client address, from ``CLIENT_IP_HEADER`` when configured."""
+    if CLIENT_IP_HEADER:
+        forwarded = request.headers.get(CLIENT_IP_HEADER)
+        if forwarded:
+            return forwarded.strip()
+    return request.client.host if request.client else "unknown"
+
+
+def reset() -> None:
+    """Forget all buckets (used by tests)."""
+    with _lock:
+        _buckets.clear()
+
+
+def rate_limit(key: str, rate: float = 5 / 60, cap: float = 10) -> Callable[[Request], None]:
+    """Build a dependency that limits requests per client IP.
+
+    Args:
+        key: Name of the limited scope, e.g. ``"login"``.
+        rate: Tokens refilled per second (default 5 per minute).
+        cap: Burst size.
+
+    Returns:
+        A FastAPI dependency raising 429 once the client's bucket is empty.
+    """
+
+    def dependency(request: Request) -> None:
+        enforce(f"{key}:{client_ip(request)}", rate, cap)
+
+    return dependency
@@ -36,12 +36,14 @@ napoleon_numpy_docstring = True
 autodoc_mock_imports = [
     'fastapi',
     'sqlalchemy',
-    'passlib',
+    'argon2',
+    'bcrypt',
     'jose',
     'email_validator',
     'cloudinary',
     'redis',
-    'slowapi',
+    'orjson',
+    'cachetools',
     'pydantic',
 ]
 
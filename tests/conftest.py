@@ -2,12 +2,20 @@
 Pytest fixtures for initializing and cleaning up the test database.
 """
 import os
+from unittest.mock import patch
 
 import dotenv
 import pytest
-from sqlalchemy import create_engine
+from redis.exceptions import RedisError
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import StaticPool
 
-from app.database import Base
+from app.database import DATABASE_URL, Base, apply_sqlite_pragmas, engine as app_engine
+from app.models import contact as _contact_model, user as _user_model  # noqa: F401  (register tables)
+from app.utils import ratelimit
+from app.utils.cache import KEY_PREFIX, get_client
 
 ENV_TEST_PATH = os.path.join(
     os.path.dirname(__file__), "..", ".env.test"
@@ -18,13 +26,104 @@ dotenv.load_dotenv(
 )
 os.environ['TESTING'] = '1'
 
-TEST_DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./test.db")
+# The app engine's URL; app.database suffixes it (and the Redis key prefix)
+# per pytest-xdist worker
+TEST_DATABASE_URL = DATABASE_URL
+
+
+def _remove_sqlite_files(url: str) -> None:
+    """Delete a file-backed SQLite database together with its WAL and SHM files."""
+    path = make_url(url).database
+    if not url.startswith("sqlite") or not path or path == ":memory:":
+        return
+    for suffix in ("", "-wal", "-shm"):
+        try:
+            os.remove(path + suffix)
+        except OSError:
+            pass
 
 
 @pytest.fixture(scope="session", autouse=True)
 def setup_test_database():
-    """Create all tables before tests and drop them after tests."""
+    """Create all tables before tests; drop them and delete the database file after tests."""
     engine = create_engine(TEST_DATABASE_URL)
+    event.listen(engine, "connect", apply_sqlite_pragmas)
     Base.metadata.create_all(bind=engine)
+    # Cached rows from an earlier run would shadow the fresh database's ids.
+    # Only this run's prefixed keys are removed, never a shared Redis database.
+    if KEY_PREFIX:
+        try:
+            client = get_client()
+            for key in client.scan_iter(f"{KEY_PREFIX}*"):
+                client.delete(key)
+        except RedisError:
+            pass
     yield
     Base.metadata.drop_all(bind=engine)
+    engine.dispose()
+    app_engine.dispose()
+    _remove_sqlite_files(TEST_DATABASE_URL)
+
+
+@pytest.fixture(scope="session", autouse=True)
+def stub_external_services():
+    """Keep SMTP and Cloudinary off the network for the whole run.
+
+    Tests that assert on these calls patch them again locally.
+    """
+    with patch("smtplib.SMTP"), \
+            patch("cloudinary.uploader.upload", return_value={"secure_url": "http://example.com/avatar.png"}), \
+            patch("cloudinary.uploader.upload_large", return_value={"secure_url": "http://example.com/avatar.png"}):
+        yield
+
+
+@pytest.fixture(autouse=True)
+def reset_rate_limits():
+    """Give each test fresh rate-limit buckets; the test client shares one IP."""
+    ratelimit.reset()
+    yield
+
+
+@pytest.fixture(scope="module")
+def memory_engine():
+    """In-memory SQLite engine with the schema created once per test module.
+
+    ``StaticPool`` keeps the single in-memory database alive across
+    connections. pysqlite's implicit transaction handling breaks SAVEPOINT, so
+    the driver is put in autocommit mode and SQLAlchemy emits BEGIN itself.
+    """
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+
+    @event.listens_for(engine, "connect")
+    def _disable_pysqlite_transactions(dbapi_connection, _record):
+        dbapi_connection.isolation_level = None
+
+    @event.listens_for(engine, "begin")
+    def _begin(conn):
+        conn.exec_driver_sql("BEGIN")
+
+    Base.metadata.create_all(bind=engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def session(memory_engine):
+    """Provide a session whose work is rolled back after each test.
+
+    The session joins an outer transaction; its commits only release
+    savepoints, so every test starts from the same empty schema.
+    """
+    connection = memory_engine.connect()
+    transaction = connection.begin()
+    _session = Session(bind=connection, autoflush=False, join_transaction_mode="create_savepoint")
+    try:
+        yield _session
+    finally:
+        _session.close()
+        transaction.rollback()
+        connection.close()
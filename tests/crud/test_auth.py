@@ -1,6 +1,13 @@
 """Unit tests for auth utilities: hashing, verification, token create/decode."""
+import hashlib
 from datetime import timedelta
+from unittest.mock import patch
 
+import pytest
+from fastapi import HTTPException
+
+from app.deps import get_current_user_id
+from app.utils import auth as auth_utils
 from app.utils.auth import (
     create_access_token,
     decode_access_token,
@@ -29,3 +36,30 @@ def test_create_and_decode_access_token():
 def test_decode_access_token_invalid():
     """Invalid token decode should return None."""
     assert decode_access_token("invalid.token") is None
+
+
+def test_get_current_user_id_caches_decode():
+    """Repeated lookups with the same token should verify the JWT only once."""
+    token = create_access_token({"user_id": 7, "email": "cached@example.com"})
+    with patch("app.utils.auth._decode", wraps=auth_utils._decode) as spy:
+        assert get_current_user_id(token) == 7
+        assert get_current_user_id(token) == 7
+    assert spy.call_count == 1
+
+
+def test_access_token_user_id_skips_jwt_decode_on_repeat():
+    """A second lookup of the same token should not verify the signature again."""
+    token = create_access_token({"user_id": 8, "email": "repeat@example.com"})
+    with patch("app.utils.auth.jwt.decode", wraps=auth_utils.jwt.decode) as spy:
+        assert auth_utils.access_token_user_id(token) == 8
+        assert auth_utils.access_token_user_id(token) == 8
+    assert spy.call_count == 1
+
+
+def test_get_current_user_id_invalid_token():
+    """Invalid tokens should raise 401 and never be cached."""
+    with pytest.raises(HTTPException) as exc:
+        get_current_user_id("invalid.token")
+    assert exc.value.status_code == 401
+    key = hashlib.sha256(b"invalid.token").digest()[:16]
+    assert key not in auth_utils._access_cache
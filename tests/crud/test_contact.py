@@ -1,18 +1,21 @@
 """Tests for contact CRUD operations and helpers.
 
-This module uses pytest fixtures and in-memory SQLite to validate CRUD behavior.
+This module uses the in-memory SQLite ``session`` fixture from conftest to
+validate CRUD behavior.
 """
 # pylint: disable=redefined-outer-name
 
 from datetime import date, timedelta
+from unittest.mock import MagicMock
 
 import pytest
 from fastapi import HTTPException
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.exc import ProgrammingError
 
 from app.schemas.contact import ContactCreate, ContactUpdate
 from app.crud.contact import (
+    bulk_create_contacts,
     create_contact,
     get_contacts,
     get_contact,
@@ -21,30 +24,14 @@ from app.crud.contact import (
     search_contacts,
     get_upcoming_birthdays,
 )
-from app.database import Base
-from app.utils.auth import create_access_token
-
-SQLALCHEMY_DATABASE_URL = "sqlite:///:memory:"
-engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
-TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-
-
-@pytest.fixture(scope="function")
-def session():
-    """Provide a transactional database session for each test."""
-    Base.metadata.create_all(bind=engine)
-    _session = TestingSessionLocal()
-    try:
-        yield _session
-    finally:
-        _session.close()
-        Base.metadata.drop_all(bind=engine)
+from app.database import count_queries
+from app.models.contact import upgrade_contact_schema
 
 
 @pytest.fixture
-def user_token():
-    """Return a signed access token for a dummy user (id=1)."""
-    return create_access_token({"user_id": 1})
+def user_id():
+    """Return the id of a dummy authenticated user."""
+    return 1
 
 
 @pytest.fixture
@@ -60,58 +47,191 @@ def contact_data():
     )
 
 
-def test_create_contact(session, user_token, contact_data):
+def test_create_contact(session, user_id, contact_data):
     """Should create a contact owned by the user."""
-    contact = create_contact(session, contact_data, user_token)
+    contact = create_contact(session, contact_data, user_id)
     assert contact.first_name == "John"
     assert contact.user_id == 1
 
 
-def test_get_contacts(session, user_token, contact_data):
+def test_create_contact_duplicate_email(session, user_id, contact_data):
+    """Should raise 409 when the email is already used by another contact."""
+    create_contact(session, contact_data, user_id)
+    with pytest.raises(HTTPException) as exc:
+        create_contact(session, contact_data, user_id)
+    assert exc.value.status_code == 409
+
+
+def test_bulk_create_contacts_single_statement(session, user_id, contact_data):
+    """Bulk creation should insert every row in one statement."""
+    batch = [contact_data.model_copy(update={"email": f"bulk{i}@example.com"}) for i in range(3)]
+    with count_queries() as queries:
+        created = bulk_create_contacts(session, batch, user_id)
+    assert [c["email"] for c in created] == [c.email for c in batch]
+    assert all(c["user_id"] == user_id for c in created)
+    assert len(queries) == 1
+
+
+def test_bulk_create_contacts_conflict_inserts_nothing(session, user_id, contact_data):
+    """A duplicate email anywhere in the batch should reject the whole batch."""
+    create_contact(session, contact_data, user_id)
+    batch = [contact_data.model_copy(update={"email": "fresh@example.com"}), contact_data]
+    with pytest.raises(HTTPException) as exc:
+        bulk_create_contacts(session, batch, user_id)
+    assert exc.value.status_code == 409
+    assert [c["email"] for c in get_contacts(session, user_id)] == [contact_data.email]
+
+
+def test_get_contacts(session, user_id, contact_data):
     """Should return a list with the created contact."""
-    create_contact(session, contact_data, user_token)
-    contacts = get_contacts(session, token=user_token)
+    create_contact(session, contact_data, user_id)
+    contacts = get_contacts(session, user_id)
     assert len(contacts) == 1
 
 
-def test_get_contact(session, user_token, contact_data):
+def test_get_contacts_single_query(session, user_id, contact_data):
+    """Listing contacts should issue exactly one SELECT regardless of row count."""
+    create_contact(session, contact_data, user_id)
+    create_contact(session, contact_data.model_copy(update={"email": "other@example.com"}), user_id)
+    session.expunge_all()
+    with count_queries() as queries:
+        contacts = get_contacts(session, user_id)
+        _ = [(c["first_name"], c["email"], c["birthday"]) for c in contacts]
+    assert len(contacts) == 2
+    assert len(queries) == 1
+
+
+def test_get_contacts_keyset_pagination(session, user_id, contact_data):
+    """after_id should continue from the last id of the previous page."""
+    ids = [
+        create_contact(session, contact_data.model_copy(update={"email": f"page{i}@example.com"}), user_id).id
+        for i in range(3)
+    ]
+    first = get_contacts(session, user_id, limit=2)
+    assert [c["id"] for c in first] == ids[:2]
+    second = get_contacts(session, user_id, limit=2, after_id=first[-1]["id"])
+    assert [c["id"] for c in second] == ids[2:]
+
+
+def test_get_contact(session, user_id, contact_data):
     """Should retrieve the contact by id."""
-    contact = create_contact(session, contact_data, user_token)
-    found = get_contact(session, contact.id, user_token)
+    contact = create_contact(session, contact_data, user_id)
+    found = get_contact(session, contact.id, user_id)
     assert found.id == contact.id
 
 
-def test_update_contact(session, user_token, contact_data):
+def test_get_contact_not_owned(session, user_id, contact_data):
+    """Should hide contacts owned by another user behind a 404."""
+    contact = create_contact(session, contact_data, user_id)
+    with pytest.raises(HTTPException) as exc:
+        get_contact(session, contact.id, user_id + 1)
+    assert exc.value.status_code == 404
+
+
+def test_update_contact(session, user_id, contact_data):
     """Should update fields of an existing contact."""
-    contact = create_contact(session, contact_data, user_token)
+    contact = create_contact(session, contact_data, user_id)
     data = contact_data.model_dump()
     data.pop("user_id", None)
     data["phone"] = "9876543210"
     update = ContactUpdate(**data)
-    updated = update_contact(session, contact.id, update, user_token)
+    updated = update_contact(session, contact.id, update, user_id)
     assert updated.phone == "9876543210"
 
 
-def test_delete_contact(session, user_token, contact_data):
+def test_update_contact_keeps_omitted_fields(session, user_id, contact_data):
+    """Fields left out of the update payload should keep their stored values."""
+    contact = create_contact(session, contact_data, user_id)
+    data = contact_data.model_dump(exclude={"extra", "user_id"})
+    updated = update_contact(session, contact.id, ContactUpdate(**data), user_id)
+    assert updated.extra == contact_data.extra
+    assert updated.user_id == user_id
+
+
+def test_update_and_delete_single_statement(session, user_id, contact_data):
+    """Update and delete should each check ownership and write in one statement."""
+    contact_id = create_contact(session, contact_data, user_id).id
+    data = contact_data.model_dump()
+    data["extra"] = "Changed"
+    with count_queries() as queries:
+        updated = update_contact(session, contact_id, ContactUpdate(**data), user_id)
+    assert updated.extra == "Changed"
+    assert len(queries) == 1
+    with pytest.raises(HTTPException):
+        delete_contact(session, contact_id, user_id + 1)
+    with count_queries() as queries:
+        assert delete_contact(session, contact_id, user_id) is True
+    assert len(queries) == 1
+
+
+def test_delete_contact(session, user_id, contact_data):
     """Should delete contact and no longer find it afterwards."""
-    contact = create_contact(session, contact_data, user_token)
-    deleted = delete_contact(session, contact.id, user_token)
+    contact = create_contact(session, contact_data, user_id)
+    deleted = delete_contact(session, contact.id, user_id)
     assert deleted is True
     
     with pytest.raises(HTTPException):
-        _ = get_contact(session, contact.id, user_token)
+        _ = get_contact(session, contact.id, user_id)
 
 
-def test_search_contacts(session, user_token, contact_data):
+def test_search_contacts(session, user_id, contact_data):
     """Should find a contact by a matching query and none otherwise."""
-    create_contact(session, contact_data, user_token)
-    results = search_contacts(session, "John", user_token)
+    create_contact(session, contact_data, user_id)
+    results = search_contacts(session, "John", user_id)
     assert len(results) == 1
-    results = search_contacts(session, "NotExist", user_token)
+    results = search_contacts(session, "NotExist", user_id)
     assert len(results) == 0
 
 
-def test_get_upcoming_birthdays(session, user_token):
+def test_search_contacts_short_query_matches_prefix(session, user_id, contact_data):
+    """Queries shorter than three characters should match as a prefix only."""
+    create_contact(session, contact_data, user_id)
+    assert len(search_contacts(session, "Jo", user_id)) == 1
+    assert len(search_contacts(session, "oh", user_id)) == 0
+    assert len(search_contacts(session, "jO", user_id)) == 1
+
+
+def test_search_contacts_uses_fts_index(session, user_id, contact_data):
+    """SQLite search should match word prefixes through the FTS5 index and follow updates."""
+    contact = create_contact(session, contact_data, user_id)
+    with count_queries() as queries:
+        assert [r["id"] for r in search_contacts(session, "jo do", user_id)] == [contact.id]
+    assert "contacts_fts MATCH" in queries[0]
+    data = contact_data.model_dump(exclude={"user_id"})
+    data["first_name"] = "Alice"
+    update_contact(session, contact.id, ContactUpdate(**data), user_id)
+    assert search_contacts(session, "alic", user_id)
+    assert not search_contacts(session, 'john" OR "x', user_id)
+
+
+def test_search_contacts_pages_results(session, user_id, contact_data):
+    """Search should honour skip and limit, ordered by id."""
+    for i in range(3):
+        create_contact(session, contact_data.model_copy(update={"email": f"page{i}@example.com"}), user_id)
+    first = search_contacts(session, "John", user_id, limit=2)
+    rest = search_contacts(session, "John", user_id, skip=2, limit=2)
+    assert len(first) == 2
+    assert len(rest) == 1
+    assert [r["id"] for r in first + rest] == sorted(r["id"] for r in first + rest)
+
+
+def test_search_contacts_falls_back_to_substring_without_fts_match(session, user_id, contact_data):
+    """Full-text matches win; substrings are searched only when nothing matches a word prefix."""
+    for last_name, email in (("Doe", "john@x.com"), ("Smith", "bob.doeman@x.com"), ("Jones", "jdoe@x.com")):
+        create_contact(session, contact_data.model_copy(update={"last_name": last_name, "email": email}), user_id)
+    with count_queries() as queries:
+        emails = [r["email"] for r in search_contacts(session, "doe", user_id)]
+    assert emails == ["john@x.com", "bob.doeman@x.com"]
+    assert len(queries) == 1
+    # Pages of one search never switch to the substring query
+    paged = [search_contacts(session, "doe", user_id, skip=i, limit=1) for i in range(3)]
+    assert [p[0]["email"] for p in paged[:2]] == emails
+    assert paged[2] == []
+    # No word starts with "ones", so the substring query is used
+    assert [r["email"] for r in search_contacts(session, "ones", user_id)] == ["jdoe@x.com"]
+
+
+def test_get_upcoming_birthdays(session, user_id):
     """Should include a contact with birthday within next 7 days."""
     today = date.today()
     contact = ContactCreate(
@@ -122,6 +242,57 @@ def test_get_upcoming_birthdays(session, user_token):
         birthday=today + timedelta(days=3),
         extra="",
     )
-    create_contact(session, contact, user_token)
-    upcoming = get_upcoming_birthdays(session, user_token)
+    create_contact(session, contact, user_id)
+    upcoming = get_upcoming_birthdays(session, user_id)
     assert len(upcoming) >= 1
+
+
+
+def test_get_upcoming_birthdays_ignores_birth_year(session, user_id):
+    """Should match on month/day only and skip birthdays outside the window."""
+    today = date.today()
+    soon = ContactCreate(
+        first_name="Soon",
+        last_name="Born",
+        email="soon@example.com",
+        phone="5555555555",
+        birthday=(today + timedelta(days=2)).replace(year=1992),
+    )
+    later = ContactCreate(
+        first_name="Later",
+        last_name="Born",
+        email="later@example.com",
+        phone="5555555555",
+        birthday=(today + timedelta(days=30)).replace(year=1992),
+    )
+    create_contact(session, soon, user_id)
+    create_contact(session, later, user_id)
+    upcoming = get_upcoming_birthdays(session, user_id)
+    assert [c["email"] for c in upcoming] == ["soon@example.com"]
+
+
+def test_upgrade_contact_schema_issues_only_missing_ddl(session):
+    """Startup upgrade should create only what the catalog lacks and survive failing steps."""
+    engine = MagicMock()
+    engine.dialect = postgresql.dialect()
+    catalog = engine.connect.return_value.__enter__.return_value
+    catalog.exec_driver_sql.side_effect = [
+        MagicMock(first=lambda: None),  # pg_trgm not installed
+        MagicMock(first=lambda: (1,)),  # search_vector already present
+        [(name,) for name in ("ix_contacts_search_vector", "ix_contacts_email", "ix_contacts_user_id_id",
+                              "ix_contacts_user_birthday_mmdd", "ix_contacts_id", "ix_contacts_user_email")],
+    ]
+    ddl = engine.begin.return_value.__enter__.return_value
+    # Creating the extension is refused; later steps still run
+    ddl.execute.side_effect = [ProgrammingError("CREATE EXTENSION", {}, Exception("permission denied"))] + [None] * 20
+    upgrade_contact_schema(engine)
+    statements = [str(c.args[0].compile(dialect=engine.dialect)) for c in ddl.execute.call_args_list]
+    assert statements[0] == "CREATE EXTENSION IF NOT EXISTS pg_trgm"
+    assert not any("search_vector" in s for s in statements)
+    assert not any("ix_contacts_user_id_id" in s or "ix_contacts_email " in s for s in statements)
+    assert any("ix_contacts_last_name_trgm" in s for s in statements)
+    assert statements[-2:] == ["DROP INDEX IF EXISTS ix_contacts_id", "DROP INDEX IF EXISTS ix_contacts_user_email"]
+    # No-op on SQLite, where create_all builds the full schema
+    with count_queries() as queries:
+        upgrade_contact_schema(session.get_bind())
+    assert queries == []
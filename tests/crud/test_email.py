@@ -1,13 +1,25 @@
 """Unit tests for email sending utilities using SMTP mocking."""
 from unittest.mock import patch
 import smtplib
-from app.utils.auth import send_verification_email
+
+import pytest
+
+from app.utils import auth as auth_utils
+from app.utils.auth import close_smtp, send_verification_email
+
+
+@pytest.fixture(autouse=True)
+def fresh_smtp_pool():
+    """Start each test without a pooled SMTP session."""
+    close_smtp()
+    yield
+    close_smtp()
 
 
 def test_send_verification_email_success():
     """send_verification_email returns True on successful SMTP send."""
     with patch("smtplib.SMTP") as mock_smtp:
-        server_mock = mock_smtp.return_value.__enter__.return_value
+        server_mock = mock_smtp.return_value
         server_mock.starttls.return_value = None
         server_mock.sendmail.return_value = {}
         result = send_verification_email("valid@example.com", 1)
@@ -25,3 +37,34 @@ def test_send_verification_email_smtp_error():
     with patch("smtplib.SMTP", side_effect=smtplib.SMTPException("smtp error")):
         result = send_verification_email("valid@example.com", 1)
         assert result is False
+
+
+def test_send_verification_email_reuses_connection():
+    """Consecutive sends should share one SMTP session while it stays alive."""
+    with patch("smtplib.SMTP") as mock_smtp:
+        mock_smtp.return_value.noop.return_value = (250, b"OK")
+        assert send_verification_email("one@example.com", 1) is True
+        assert send_verification_email("two@example.com", 2) is True
+        assert mock_smtp.call_count == 1
+        assert mock_smtp.return_value.sendmail.call_count == 2
+
+
+def test_send_verification_email_reconnects_dead_connection():
+    """A pooled session failing NOOP should be replaced by a new one."""
+    with patch("smtplib.SMTP") as mock_smtp:
+        mock_smtp.return_value.noop.side_effect = smtplib.SMTPServerDisconnected()
+        assert send_verification_email("one@example.com", 1) is True
+        assert send_verification_email("two@example.com", 2) is True
+        assert mock_smtp.call_count == 2
+
+
+def test_smtp_connect_uses_timeout_without_holding_lock():
+    """Connecting must time out and happen outside the pool lock."""
+    def connect(*_args, **_kwargs):
+        assert not auth_utils._smtp_lock.locked()
+        return mock_server
+
+    with patch("smtplib.SMTP", side_effect=connect) as mock_smtp:
+        mock_server = mock_smtp.return_value
+        assert send_verification_email("one@example.com", 1) is True
+    assert mock_smtp.call_args.kwargs["timeout"] == auth_utils.SMTP_TIMEOUT
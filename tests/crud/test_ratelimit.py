@@ -0,0 +1,63 @@
+"""
+Unit tests for the in-process token-bucket rate limiter.
+"""
+from unittest.mock import patch
+
+import pytest
+from fastapi import HTTPException
+from starlette.requests import Request
+
+from app.utils import ratelimit
+from app.utils.ratelimit import TokenBucket, rate_limit
+
+
+def _request(host: str, headers=()) -> Request:
+    return Request({"type": "http", "client": (host, 1234), "headers": list(headers)})
+
+
+def test_bucket_allows_burst_then_refills():
+    """A bucket allows ``cap`` requests at once and refills at ``rate`` per second."""
+    with patch("app.utils.ratelimit.time.monotonic", return_value=100.0) as clock:
+        bucket = TokenBucket(rate=1, cap=2)
+        assert bucket.allow()
+        assert bucket.allow()
+        assert not bucket.allow()
+        clock.return_value = 101.0
+        assert bucket.allow()
+        assert not bucket.allow()
+
+
+def test_rate_limit_dependency_is_per_client():
+    """Exhausting one client's bucket must not affect another client."""
+    limit = rate_limit("test", rate=0.001, cap=2)
+    limit(_request("1.1.1.1"))
+    limit(_request("1.1.1.1"))
+    with pytest.raises(HTTPException) as exc:
+        limit(_request("1.1.1.1"))
+    assert exc.value.status_code == 429
+    limit(_request("2.2.2.2"))
+
+
+def test_rate_limit_uses_trusted_client_ip_header():
+    """Behind a proxy, clients sharing the proxy address get separate buckets."""
+    limit = rate_limit("proxied", rate=0.001, cap=1)
+    with patch("app.utils.ratelimit.CLIENT_IP_HEADER", "Fly-Client-IP"):
+        limit(_request("10.0.0.1", [(b"fly-client-ip", b"1.1.1.1")]))
+        limit(_request("10.0.0.1", [(b"fly-client-ip", b"2.2.2.2")]))
+        with pytest.raises(HTTPException):
+            limit(_request("10.0.0.1", [(b"fly-client-ip", b"1.1.1.1")]))
+    # Without a configured header, a client-supplied one is ignored
+    limit(_request("3.3.3.3", [(b"fly-client-ip", b"4.4.4.4")]))
+    with pytest.raises(HTTPException):
+        limit(_request("3.3.3.3", [(b"fly-client-ip", b"5.5.5.5")]))
+
+
+def test_idle_buckets_are_pruned():
+    """Full buckets are dropped once the key limit is reached."""
+    with patch("app.utils.ratelimit._MAX_BUCKETS", 2):
+        ratelimit.hit("a", rate=1000, cap=1)
+        ratelimit.hit("b", rate=0.001, cap=5)
+        with patch("app.utils.ratelimit.time.monotonic", side_effect=lambda: 1e9):
+            ratelimit.hit("c", rate=1, cap=1)
+    assert "a" not in ratelimit._buckets
+    assert "c" in ratelimit._buckets
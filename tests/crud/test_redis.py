@@ -1,9 +1,10 @@
 """Unit tests for Redis caching utilities and get_current_user behavior."""
 import json
-from unittest.mock import patch
+from unittest.mock import MagicMock, patch
 
-from app.utils.cache import cache_user, delete_user_cache, get_cached_user
-from app.utils import auth as auth_utils
+from app.utils.cache import _user_key, cache_user, delete_user_cache, get_cached_user
+from app.deps import get_current_user
+from app.models.user import User
 
 
 class FakeRedis:
@@ -48,12 +49,26 @@ def test_delete_user_cache():
 
 
 def test_get_current_user_reads_from_cache():
-    """get_current_user should return cached user when token matches cache."""
-    token = auth_utils.create_access_token({"user_id": 3, "email": "c@example.com"})
+    """get_current_user should serve a complete cached profile without the DB."""
     fake = FakeRedis()
-    data = {"id": 3, "username": "cached", "email": "c@example.com", "role": "user"}
-    fake.setex("user:3", 1800, json.dumps(data))
+    data = {"id": 3, "username": "cached", "email": "c@example.com", "is_active": True,
+            "is_verified": False, "avatar_url": None, "role": "user"}
+    fake.setex(_user_key(3), 1800, json.dumps(data))
+    db = MagicMock()
     with patch('app.utils.cache.get_client', return_value=fake):
-        user = auth_utils.get_current_user(token)
-        assert user is not None
-        assert user["username"] == "cached"
+        user = get_current_user(user_id=3, db=db)
+    assert user == data
+    db.get.assert_not_called()
+
+
+def test_get_current_user_primes_cache_on_partial_entry():
+    """Entries missing UserOut fields are rebuilt from the database."""
+    fake = FakeRedis()
+    fake.setex(_user_key(4), 1800, json.dumps({"user_id": 4, "email": "p@example.com", "role": "user"}))
+    db = MagicMock()
+    db.get.return_value = User(id=4, username="partial", email="p@example.com", hashed_password="x",
+                               is_active=True, is_verified=True, role="user")
+    with patch('app.utils.cache.get_client', return_value=fake):
+        user = get_current_user(user_id=4, db=db)
+        assert user["username"] == "partial"
+        assert get_cached_user(4) == user
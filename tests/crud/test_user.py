@@ -1,33 +1,18 @@
 """Tests for user CRUD and auth operations.
 
-Uses in-memory SQLite and pytest fixtures.
+Uses the in-memory SQLite ``session`` fixture from conftest.
 """
 # pylint: disable=redefined-outer-name
 
+from unittest.mock import patch
+
+import bcrypt
 import pytest
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
 from fastapi import HTTPException
 
 from app.schemas.user import UserCreate
 from app.crud.user import create_user, authenticate_user, verify_user_email, update_avatar
-from app.database import Base
-
-SQLALCHEMY_DATABASE_URL = "sqlite:///:memory:"
-engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
-TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-
-
-@pytest.fixture(scope="function")
-def session():
-    """Provide a transactional database session for each test."""
-    Base.metadata.create_all(bind=engine)
-    _session = TestingSessionLocal()
-    try:
-        yield _session
-    finally:
-        _session.close()
-        Base.metadata.drop_all(bind=engine)
+from app.utils import auth as auth_utils
 
 
 def test_create_user(session):
@@ -49,6 +34,15 @@ def test_create_user_duplicate_email(session):
     assert exc.value.status_code == 409
 
 
+def test_create_user_duplicate_username(session):
+    """Should report which unique field collided."""
+    create_user(session, UserCreate(username="same", email="first@example.com", password="pass1"))
+    with pytest.raises(HTTPException) as exc:
+        create_user(session, UserCreate(username="same", email="second@example.com", password="pass1"))
+    assert exc.value.status_code == 409
+    assert exc.value.detail == "Username already taken"
+
+
 def test_authenticate_user(session):
     """Should authenticate with valid credentials and fail otherwise."""
     user_in = UserCreate(username="authuser", email="auth@example.com", password="secret")
@@ -60,6 +54,25 @@ def test_authenticate_user(session):
         _ = authenticate_user(session, "authuser", "wrongpass")
 
 
+def test_authenticate_unknown_user_still_verifies_a_hash(session):
+    """Unknown usernames should cost a hash check, like a wrong password."""
+    with patch("app.utils.auth.verify_password", return_value=False) as verify:
+        with pytest.raises(HTTPException) as exc:
+            authenticate_user(session, "nobody", "secret")
+    assert exc.value.status_code == 401
+    verify.assert_called_once_with("secret", auth_utils._DUMMY_HASH)
+
+
+def test_authenticate_user_upgrades_legacy_bcrypt_hash(session):
+    """A legacy bcrypt hash should still verify and be rehashed with argon2id."""
+    user = create_user(session, UserCreate(username="legacy", email="legacy@example.com", password="x"))
+    user.hashed_password = bcrypt.hashpw(b"secret", bcrypt.gensalt(rounds=4)).decode()
+    session.commit()
+    user = authenticate_user(session, "legacy", "secret")
+    assert user.hashed_password.startswith("$argon2id$")
+    assert authenticate_user(session, "legacy", "secret").id == user.id
+
+
 def test_verify_user_email(session):
     """Should set is_verified to True."""
     user_in = UserCreate(username="verifyuser", email="verify@example.com", password="pass")
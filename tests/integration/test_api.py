@@ -1,6 +1,8 @@
 import os
 from dotenv import load_dotenv
+from app.database import SessionLocal, count_queries
 from app.main import app
+from app.models.user import User
 from fastapi.testclient import TestClient
 
 load_dotenv(dotenv_path=os.path.join(os.path.dirname(__file__), '../../.env.test'), override=True)
@@ -85,6 +87,12 @@ def test_get_contacts():
     data = response.json()
     assert isinstance(data, list)
     assert any(c["first_name"] == "Jane" for c in data)
+    page = client.get("/contacts/", params={"limit": 1}, headers={
+        "Authorization": f"Bearer {token}",
+        "Origin": "https://frontend.example.com",
+    })
+    assert page.headers["X-Next-Cursor"] == str(page.json()[0]["id"])
+    assert "X-Next-Cursor" in page.headers["Access-Control-Expose-Headers"]
 
 def test_update_contact():
     client.post("/users/register", json={
@@ -171,3 +179,150 @@ def test_search_contacts():
     response_none = client.get("/contacts/search?q=NotExist", headers={"Authorization": f"Bearer {token}"})
     assert response_none.status_code == 200
     assert response_none.json() == []
+
+def test_contact_read_query_budget():
+    client.post("/users/register", json={
+        "username": "budgetuser",
+        "email": "budgetuser@example.com",
+        "password": "password123"
+    })
+    login = client.post("/users/login", data={
+        "username": "budgetuser",
+        "password": "password123"
+    })
+    headers = {"Authorization": f"Bearer {login.json()['access_token']}"}
+    for i in range(3):
+        client.post("/contacts/", json={
+            "first_name": "Budget",
+            "last_name": f"Row{i}",
+            "email": f"budget{i}@example.com",
+            "phone": "6666666666",
+            "birthday": "1990-01-01"
+        }, headers=headers)
+    contact_id = client.get("/contacts/", headers=headers).json()[0]["id"]
+    # Each read endpoint must cost one query regardless of how many rows it returns
+    for path in ("/contacts/", "/contacts/search?q=Budget", f"/contacts/{contact_id}", "/contacts/birthdays/upcoming"):
+        with count_queries() as queries:
+            response = client.get(path, headers=headers)
+        assert response.status_code == 200
+        assert len(queries) == 1, (path, queries)
+
+
+def test_get_contact_served_from_cache_until_changed():
+    client.post("/users/register", json={
+        "username": "cachecontact",
+        "email": "cachecontact@example.com",
+        "password": "password123"
+    })
+    login = client.post("/users/login", data={
+        "username": "cachecontact",
+        "password": "password123"
+    })
+    headers = {"Authorization": f"Bearer {login.json()['access_token']}"}
+    payload = {
+        "first_name": "Cached",
+        "last_name": "Contact",
+        "email": "cached.contact@example.com",
+        "phone": "7777777777",
+        "birthday": "1990-01-01"
+    }
+    contact_id = client.post("/contacts/", json=payload, headers=headers).json()["id"]
+    first = client.get(f"/contacts/{contact_id}", headers=headers)
+    with count_queries() as queries:
+        second = client.get(f"/contacts/{contact_id}", headers=headers)
+    assert second.content == first.content
+    assert second.headers["content-type"] == "application/json"
+    assert "extra" not in second.json()  # null fields are omitted
+    assert queries == []
+    client.put(f"/contacts/{contact_id}", json={**payload, "phone": "8888888888"}, headers=headers)
+    assert client.get(f"/contacts/{contact_id}", headers=headers).json()["phone"] == "8888888888"
+    client.delete(f"/contacts/{contact_id}", headers=headers)
+    assert client.get(f"/contacts/{contact_id}", headers=headers).status_code == 404
+
+
+def test_create_contact_rejects_malformed_email():
+    client.post("/users/register", json={
+        "username": "bademail",
+        "email": "bademail@example.com",
+        "password": "password123"
+    })
+    login = client.post("/users/login", data={
+        "username": "bademail",
+        "password": "password123"
+    })
+    headers = {"Authorization": f"Bearer {login.json()['access_token']}"}
+    response = client.post("/contacts/", json={
+        "first_name": "Bad",
+        "last_name": "Email",
+        "email": "not-an-email",
+        "phone": "1111111111",
+        "birthday": "1990-01-01"
+    }, headers=headers)
+    assert response.status_code == 422
+
+
+def test_list_contacts_limit_is_bounded():
+    client.post("/users/register", json={
+        "username": "pagelimit",
+        "email": "pagelimit@example.com",
+        "password": "password123"
+    })
+    login = client.post("/users/login", data={
+        "username": "pagelimit",
+        "password": "password123"
+    })
+    headers = {"Authorization": f"Bearer {login.json()['access_token']}"}
+    assert client.get("/contacts/?limit=101", headers=headers).status_code == 422
+    assert client.get("/contacts/?limit=100", headers=headers).status_code == 200
+    assert client.get("/contacts/?skip=-1", headers=headers).status_code == 422
+
+
+def test_bulk_create_contacts():
+    client.post("/users/register", json={
+        "username": "bulkuser",
+        "email": "bulkuser@example.com",
+        "password": "password123"
+    })
+    login = client.post("/users/login", data={
+        "username": "bulkuser",
+        "password": "password123"
+    })
+    headers = {"Authorization": f"Bearer {login.json()['access_token']}"}
+    batch = [{
+        "first_name": "Bulk",
+        "last_name": f"Row{i}",
+        "email": f"bulkrow{i}@example.com",
+        "phone": "5555555555",
+        "birthday": "1990-01-01"
+    } for i in range(2)]
+    response = client.post("/contacts/bulk", json=batch, headers=headers)
+    assert response.status_code == 200
+    assert [c["email"] for c in response.json()] == ["bulkrow0@example.com", "bulkrow1@example.com"]
+    assert client.post("/contacts/bulk", json=batch, headers=headers).status_code == 409
+    assert client.post("/contacts/bulk", json=[], headers=headers).status_code == 422
+
+
+def test_pool_health():
+    assert client.get("/contacts/pool-health").status_code == 401
+    client.post("/users/register", json={
+        "username": "poolhealth",
+        "email": "poolhealth@example.com",
+        "password": "password123"
+    })
+    login = client.post("/users/login", data={
+        "username": "poolhealth",
+        "password": "password123"
+    })
+    headers = {"Authorization": f"Bearer {login.json()['access_token']}"}
+    assert client.get("/contacts/pool-health", headers=headers).status_code == 403
+    db = SessionLocal()
+    try:
+        db.query(User).filter(User.username == "poolhealth").update({"role": "admin"})
+        db.commit()
+    finally:
+        db.close()
+    response = client.get("/contacts/pool-health", headers=headers)
+    assert response.status_code == 200
+    body = response.json()
+    assert body["pool"]
+    assert "status" in body
@@ -1,10 +1,15 @@
+import io
 import os
 from unittest.mock import patch
 from dotenv import load_dotenv
+from fastapi import UploadFile
 from fastapi.testclient import TestClient
+from sqlalchemy import event
 
+from app.database import count_queries, engine
 from app.main import app
-from app.utils.cache import get_client
+from app.routers import user as user_router
+from app.utils.cache import _user_key, get_client
 
 load_dotenv(dotenv_path=os.path.join(os.path.dirname(__file__), '../../.env.test'), override=True)
 os.environ['TESTING'] = '1'
@@ -77,21 +82,32 @@ def test_cache_miss_then_hit_on_me_endpoint():
 
     # Now ensure cache is set
     r = get_client()
-    assert r.get(f'user:{user_id}') is not None
+    assert r.get(_user_key(user_id)) is not None
 
-    # Next call should be a hit (served quickly, still returns 200)
-    resp3 = client.get('/users/me', headers={'Authorization': f'Bearer {access}'})
+    # Next call should be a hit, served without touching the database; the
+    # request's session never checks a connection out of the pool
+    checkouts = []
+
+    def listener(*args):
+        checkouts.append(args)
+
+    event.listen(engine, 'checkout', listener)
+    try:
+        with count_queries() as queries:
+            resp3 = client.get('/users/me', headers={'Authorization': f'Bearer {access}'})
+    finally:
+        event.remove(engine, 'checkout', listener)
     assert resp3.status_code == 200
-    assert resp3.json()['id'] == user_id
+    assert resp3.json() == resp2.json()
+    assert queries == []
+    assert checkouts == []
 
 
 def test_avatar_update_role_enforcement_403_for_non_admin():
     access, _ = _register_and_login('regular', 'regular@example.com')
-    # Mock cloudinary uploader to avoid external call
-    with patch('cloudinary.uploader.upload', return_value={'secure_url': 'http://example.com/avatar.png'}):
-        # Send a small dummy file
-        files = {'file': ('avatar.png', b'fakeimgbytes', 'image/png')}
-        resp = client.post('/users/avatar', headers={'Authorization': f'Bearer {access}'}, files=files)
+    # Send a small dummy file
+    files = {'file': ('avatar.png', b'fakeimgbytes', 'image/png')}
+    resp = client.post('/users/avatar', headers={'Authorization': f'Bearer {access}'}, files=files)
     assert resp.status_code == 403
     assert resp.json()['detail'] == 'Only admin can change avatar'
 
@@ -116,12 +132,58 @@ def test_avatar_update_200_for_admin():
         db.close()
 
     # Now user is admin, upload avatar
-    with patch('cloudinary.uploader.upload', return_value={'secure_url': 'http://example.com/avatar2.png'}):
-        files = {'file': ('avatar2.png', b'fakeimgbytes', 'image/png')}
-        resp = client.post('/users/avatar', headers={'Authorization': f'Bearer {access}'}, files=files)
+    files = {'file': ('avatar2.png', b'fakeimgbytes', 'image/png')}
+    resp = client.post('/users/avatar', headers={'Authorization': f'Bearer {access}'}, files=files)
     assert resp.status_code == 200
     body = resp.json()
     assert 'avatar_url' in body or body.get('avatar')
     # Cache should be refreshed
     r = get_client()
-    assert r.get(f"user:{body['id']}") is not None
+    assert r.get(_user_key(body['id'])) is not None
+
+
+def test_register_sends_verification_email_in_background():
+    with patch('app.routers.user.send_verification_email') as send:
+        resp = client.post('/users/register', json={'username': 'bgmail', 'email': 'bgmail@example.com', 'password': 'password123'})
+    assert resp.status_code == 201
+    send.assert_called_once_with('bgmail@example.com', resp.json()['id'])
+
+
+def test_upload_avatar_chunks_large_files():
+    small = UploadFile(file=io.BytesIO(b'x' * 10), size=10)
+    large = UploadFile(file=io.BytesIO(b'x' * 10), size=user_router._LARGE_UPLOAD_THRESHOLD + 1)
+    huge = UploadFile(file=io.BytesIO(b'x' * 10), size=user_router._HUGE_UPLOAD_THRESHOLD + 1)
+    with patch('cloudinary.uploader.upload', return_value={'secure_url': 'small'}) as upload, \
+            patch('cloudinary.uploader.upload_large', return_value={'secure_url': 'large'}) as upload_large:
+        assert user_router._upload_avatar(small)['secure_url'] == 'small'
+        assert user_router._upload_avatar(large)['secure_url'] == 'large'
+        user_router._upload_avatar(huge)
+    upload.assert_called_once()
+    chunk_sizes = [c.kwargs['chunk_size'] for c in upload_large.call_args_list]
+    assert chunk_sizes == [user_router._UPLOAD_CHUNK_SIZE, user_router._HUGE_UPLOAD_CHUNK_SIZE]
+
+
+def test_set_role_single_update():
+    admin_access, _ = _register_and_login('roleadmin', 'roleadmin@example.com')
+    _register_and_login('roletarget', 'roletarget@example.com')
+    from app.database import SessionLocal
+    from app.models.user import User
+    db = SessionLocal()
+    try:
+        db.query(User).filter(User.username == 'roleadmin').update({'role': 'admin'})
+        db.commit()
+        admin_id = db.query(User.id).filter(User.username == 'roleadmin').scalar()
+        target_id = db.query(User.id).filter(User.username == 'roletarget').scalar()
+    finally:
+        db.close()
+    headers = {'Authorization': f'Bearer {admin_access}'}
+    # Re-affirming the admin's own role refreshes their stale cache entry
+    assert client.post('/users/set-role', params={'user_id': admin_id, 'role': 'admin'}, headers=headers).status_code == 200
+    # With the admin role cached, a role change is a single UPDATE ... RETURNING
+    with count_queries() as queries:
+        resp = client.post('/users/set-role', params={'user_id': target_id, 'role': 'admin'}, headers=headers)
+    assert resp.status_code == 200
+    assert resp.json()['role'] == 'admin'
+    assert len(queries) == 1, queries
+    missing = client.post('/users/set-role', params={'user_id': 999999, 'role': 'user'}, headers=headers)
+    assert missing.status_code == 404